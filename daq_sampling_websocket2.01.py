@@ -4,9 +4,27 @@ Unified DAQ + RIG server with Recorder (SQLite), WebSocket control, and broadcas
 
 Usage:
   python daq_rig_server_complete.py
+  python daq_rig_server_complete.py --backend sim     # no NI hardware / nidaqmx needed
+  python daq_rig_server_complete.py --log-level debug # echo commands, periodic hot-path summaries
 
 WebSocket command examples (JSON):
   {"cmd":"configure_daq", "device": null, "channels":["ai0"], "sample_rate_hz":30000}
+  {"cmd":"configure_daq", "channels":["ai0","ai1","ai2"]}   # one ring, recorder stream and broadcast series per channel
+  {"cmd":"configure_daq", "mode":"process"}          # acquire in a child process (shared-memory ring)
+  {"cmd":"configure_daq", "read_mode":"event"}       # every-N-samples callbacks instead of polling
+  {"cmd":"configure_daq", "target_latency_ms":20}    # read size = sample rate x latency, grows when behind
+  {"cmd":"configure_daq", "backend":"sim", "sample_rate_hz":100000}   # simulated device, no hardware needed
+  {"cmd":"configure_daq", "backend":"sim", "sim":{"source":"replay", "path":"Field_Job_2025-08-20_09-46-11.csv"}}
+  {"cmd":"configure_daq", "measurement":"current"}   # 4-20 mA channels
+  {"cmd":"configure_daq", "calibration":{"ai1":{"kind":"linear","out_max":10000}, "ai2":{"kind":"poly","coeffs":[1.2e6,-4800]}}}
+  {"cmd":"status"}
+  {"cmd":"set_stream_format", "format":"binary", "dtype":"f32"}   # packed stream frames (see Stream Frames); "json" to revert
+  {"cmd":"set_stream_format", "format":"json", "compress":"zlib"}  # stream payloads as zlib-compressed binary messages
+  {"cmd":"subscribe", "streams":["rawPressure"], "rate_hz":600, "mode":"minmax"}   # per-client series / decimation
+  {"cmd":"subscribe", "streams":["ctSpeed"], "rate_hz":2, "mode":"mean"}
+  {"cmd":"subscribe"}                                # back to everything, every sample
+  {"cmd":"subscribe", "aligned":true, "rate_hz":20, "streams":["ai0","ctDepth","ctSpeed"]}   # one common clock
+  {"cmd":"history", "seconds":30, "rate_hz":2000, "mode":"minmax"}   # one binary backfill frame, then live from its end
   {"cmd":"start_daq"}
   {"cmd":"stop_daq"}
 
@@ -22,40 +40,107 @@ WebSocket command examples (JSON):
   {"cmd":"shutdown"}
 
 Notes:
-- DAQSession.auto device detection attempts several heuristics to find module name.
+- NidaqmxBackend.discover_device attempts several heuristics to find module name.
 - RIG lines can be: JSON object with named fields, JSON array of 7 vals, or CSV of 7 vals.
 """
 
 from __future__ import annotations
+import abc
+import argparse
 import asyncio
+import csv
 import json
+import logging
+import logging.handlers
+import math
+import multiprocessing
 import os
+import queue
 import re
 import sqlite3
+import struct
+import sys
+import threading
 import time
+import zlib
 from collections import deque
-from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from dataclasses import dataclass, field, fields, replace
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
 
+import numpy as np
 import websockets
-# DAQ
-import nidaqmx
-from nidaqmx.constants import CurrentUnits, CurrentShuntResistorLocation, AcquisitionType, READ_ALL_AVAILABLE
-import nidaqmx.system
-# Serial
-import serial_asyncio
-import inspect
+# DAQ (optional: without it only the "sim" backend is available)
+try:
+    import nidaqmx
+    from nidaqmx.constants import CurrentUnits, CurrentShuntResistorLocation, AcquisitionType, READ_ALL_AVAILABLE
+    from nidaqmx.constants import OverwriteMode, ReadRelativeTo
+    from nidaqmx.errors import DaqReadError
+    import nidaqmx.system
+    from nidaqmx.stream_readers import AnalogMultiChannelReader
+except ImportError:
+    nidaqmx = None
+# Serial (optional: only needed for the RIG session)
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
 
 # ---------------- Config ----------------
 PORT_NUMBER = 9813
 BROADCAST_HZ = 15
-DAQ_READ_CHUNK = 100
-WS_MAX_QUEUE = 3
-
-
-# Verbose output flag for debugging
-VERBOSE = True
+DAQ_TARGET_LATENCY_MS = 50.0  # default read size: this much data per read
+DAQ_CHUNK_GROWTH = 8          # reads may grow to this many times the target chunk (capped at 1 s) when behind
+DAQ_CHUNK_SHRINK_READS = 50   # consecutive caught-up reads before a grown chunk halves again
+DAQ_OVERRUN_MARGIN = 0.1      # after an overrun, skip this fraction of the buffer past the oldest sample
+DAQ_GAP_HISTORY = 100         # recent gap markers kept for the stream broadcast
+DAQ_RING_SECONDS = 30.0       # history kept per DAQ channel ring (sized from the sample rate); the history horizon
+DAQ_RING_MIN_SAMPLES = 27_000 # DAQ rings never hold fewer samples than this, however low the sample rate
+DAQ_ENVELOPE_BUCKETS_S = (0.001, 0.01, 0.1)   # min/max envelope bucket widths kept alongside the DAQ rings
+DAQ_CLOCK_GAIN = 0.01         # fraction of timestamp error corrected per block (drift slew)
+DAQ_CLOCK_STEP_S = 0.2        # timestamp error beyond this is a host clock step (NTP): re-anchor instead of slewing
+DAQ_SHM_SECONDS = 10.0        # shared-memory ring length in process mode
+DAQ_SHM_POLL_S = 0.02         # how often the server drains the shared-memory ring
+RIG_RING_SECONDS = 600.0      # history kept per rig series
+RIG_MAX_RATE_HZ = 10.0        # fastest expected rig line rate, for sizing the rig rings
+RIG_RATE_WINDOW = 20          # recent rig lines used to measure the rig rate for decimation
+RIG_HOLD_S = 5.0              # aligned frames hold a rig value this long before it counts as missing
+ALIGN_DELAY_S = 0.25          # aligned frames trail wall-clock time by this much so DAQ reads have landed
+ALIGN_RECORD_HZ = 10.0        # common clock of the recorder's aligned_blocks table (None = don't record)
+RECORD_WRITER_QUEUE = 16      # batches waiting for the recorder's writer thread before the consumers wait
+RECORD_DTYPE = "<f4"          # sample BLOBs in daq_blocks / aligned_blocks ("<f8" to keep full doubles)
+WS_MAX_QUEUE = 3              # stream frames queued per client; the oldest is dropped when full
+WS_LAG_DISCONNECT_S = 10.0    # disconnect a client that keeps dropping frames for this long
+WS_COMPRESSION = "deflate"    # permessage-deflate for clients that offer it (None = never); costs a compress per connection
+WS_ZLIB_LEVEL = 1             # clients that opt into "compress":"zlib" get each payload compressed once, at this level
+STREAM_MAX_SAMPLES = 20_000   # per stream per frame; a client further behind skips ahead (seq jump)
+HISTORY_MAX_BYTES = 768 * 1024   # history frame budget, shared by its series (stays under 1 MiB client limits)
+
+# Simulated DAQ defaults (override per run with configure_daq {"sim": {...}})
+SIM_MAX_RATE_HZ = 100_000
+SIM_DEFAULTS: Dict[str, Any] = {
+    "source": "dips",             # "dips" (synthetic, like simulate_stream_array) | "replay"
+    "path": None,                 # replay: Field_Job_*.csv (daq_rawPressure) or recorder job.sqlite
+    "mean_level": 4000.0,         # psi
+    "dip_depth": 20.0,            # psi
+    "dip_duration_s": 0.125,
+    "period_s_jitter": (3.0, 5.0),
+    "noise_sigma": 200.0,         # psi
+    "seed": 42,
+}
+
+# 4-20 mA transducer scaling
+PSI_FULL_SCALE = 15000.0
+LOOP_MIN_A = 0.004
+LOOP_MAX_A = 0.020
+SHUNT_OHMS = 250.0            # voltage channels see the loop across a 250 ohm shunt (1-5 V)
+OPEN_LOOP_A = 0.0036          # below this the loop is broken / transducer unplugged (NAMUR NE43)
+
+
+# Console logging: "data" (stream dumps) | "debug" (command echo, hot-path summaries) | "info" | "warn" | "error"
+LOG_LEVEL = "info"
+LOG_SUMMARY_S = 10.0          # hot-path counters are logged as one summary line at most this often
 
 # ----------- Logging Colors -----------
 COLOR_RESET = "\033[0m"
@@ -67,92 +152,619 @@ COLOR_BLUE = "\033[94m"
 COLOR_ORANGE = "\033[38;5;172m"
 COLOR_GRAY = "\033[90m"
 
+LOG_COLORS = {
+    "info": COLOR_CYAN,
+    "success": COLOR_GREEN,
+    "warn": COLOR_YELLOW,
+    "error": COLOR_RED,
+    "debug": COLOR_GRAY,
+    "header": COLOR_BLUE,
+    "data": COLOR_ORANGE,
+}
+
 # ---------------- Utilities ----------------
-def log(message, level="info"):
-
-    if not VERBOSE:
-        return
-    
-    # ts = datetime.datetime.now().strftime("%H:%M:%S")
-    frame = inspect.currentframe().f_back
-    color = {
-        "info": COLOR_CYAN,
-        "success": COLOR_GREEN,
-        "warn": COLOR_YELLOW,
-        "error": COLOR_RED,
-        "debug": COLOR_GRAY,
-        "header": COLOR_BLUE,
-        "data": COLOR_ORANGE,
-    }.get(level, COLOR_RESET)
-
-    print(f"{color}[DSW #{frame.f_lineno}] {message}{COLOR_RESET}")
+LOG_DATA = 5                  # below DEBUG: full data dumps
+LOG_LEVELS = {
+    "data": LOG_DATA,
+    "debug": logging.DEBUG,
+    "log": logging.DEBUG,
+    "info": logging.INFO,
+    "header": logging.INFO,
+    "success": logging.INFO,
+    "warn": logging.WARNING,
+    "error": logging.ERROR,
+}
+_logger = logging.getLogger("dsw")
+
+class _ColorFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        color = LOG_COLORS.get(getattr(record, "tag", ""), COLOR_RESET)
+        return f"{color}[DSW #{record.lineno}] {record.getMessage()}{COLOR_RESET}"
+
+def setup_logging(level: str = LOG_LEVEL) -> logging.handlers.QueueListener:
+    """
+    Route log() through a QueueHandler: callers only enqueue the record, and a background
+    thread (the returned listener; stop() it to flush) writes the console. Call once per process.
+    """
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _logger.handlers[:] = [logging.handlers.QueueHandler(q)]
+    _logger.setLevel(LOG_LEVELS[level])
+    _logger.propagate = False
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(_ColorFormatter())
+    listener = logging.handlers.QueueListener(q, console)
+    listener.start()
+    return listener
+
+def log_enabled(level: str) -> bool:
+    return _logger.isEnabledFor(LOG_LEVELS.get(level, logging.INFO))
+
+def log(message, level="info", *args):
+    """
+    Log message (% args, if given) at level. Disabled levels cost one comparison: formatting and
+    the caller line lookup only happen for records that will be written.
+    """
+    lvl = LOG_LEVELS.get(level, logging.INFO)
+    if _logger.isEnabledFor(lvl):
+        _logger.log(lvl, message, *args, stacklevel=2, extra={"tag": level})
+
+def log_level() -> str:
+    """Name of the level setup_logging() was given (to hand on to child processes)."""
+    return next((k for k in ("data", "debug", "info", "warn", "error") if LOG_LEVELS[k] == _logger.level), LOG_LEVEL)
+
+class LogSummary:
+    """
+    Hot-path counters, logged as one line at most every `period` s instead of a line per event.
+    The first event after a quiet period is logged right away; later ones are summed and written by
+    the add() or tick() that comes `period` s after the last line, or by flush() (call it on stop).
+    add(detail=...) keeps the latest detail (e.g. an error message) to show with the next line.
+    """
+    def __init__(self, name: str, level: str = "debug", period: float = LOG_SUMMARY_S):
+        self.name, self.level, self.period = name, level, period
+        self.counts: Dict[str, float] = {}
+        self.detail: Optional[str] = None
+        self._last = float("-inf")
+
+    def _emit(self, counts: Dict[str, float], now: float, since: Optional[float]) -> None:
+        self._last = now
+        if log_enabled(self.level):
+            text = " ".join(f"{k}={v:g}" for k, v in counts.items())
+            if self.detail is not None:
+                text += f" (last: {self.detail})"
+            span = "" if since is None else f" (last {now - since:.0f} s)"
+            # attributed to the add() / tick() / flush() call site
+            _logger.log(LOG_LEVELS[self.level], "%s%s: %s", self.name, span, text,
+                        stacklevel=3, extra={"tag": self.level})
+        self.detail = None
+
+    def add(self, detail: Optional[str] = None, **counts: float) -> None:
+        now = time.monotonic()
+        if detail is not None:
+            self.detail = detail
+        if not self.counts and now - self._last >= self.period:
+            self._emit(counts, now, None)
+            return
+        for k, v in counts.items():
+            self.counts[k] = self.counts.get(k, 0) + v
+        if now - self._last >= self.period:
+            self._emit(self.counts, now, self._last)
+            self.counts = {}
+
+    def tick(self) -> None:
+        """Write pending counts once the period is up; call from a loop that runs whether or not events happen."""
+        if self.counts:
+            now = time.monotonic()
+            if now - self._last >= self.period:
+                self._emit(self.counts, now, self._last)
+                self.counts = {}
+
+    def flush(self) -> None:
+        if self.counts:
+            self._emit(self.counts, time.monotonic(), self._last)
+            self.counts = {}
 
 def safe_json(data: Dict[str, Any]) -> str:
     return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
 
+def json_floats(a: np.ndarray) -> List[Optional[float]]:
+    """ndarray -> list for JSON; NaN (e.g. open-loop samples) becomes null."""
+    nan = np.isnan(a)
+    if nan.any():
+        return np.where(nan, None, a).tolist()
+    return a.tolist()
+
 def sanitize_name(s: str) -> str:
     s = str(s).strip()
     s = re.sub(r"[^A-Za-z0-9._\- ]+", "_", s)
     return s or "job"
 
 # ---------------- RingBuffers ----------------
+class DAQGap(NamedTuple):
+    """
+    Samples missing from the DAQ stream (driver overrun or a consumer falling behind), or, with
+    missing == 0, a jump of the time axis after a host clock step (t_end < t_start if it went back).
+    """
+    t_start: float          # timestamp of the last sample before the gap
+    t_end: float            # timestamp of the first sample after the gap
+    index: int              # sample index of the first missing sample
+    missing: int            # samples per channel missing
+
+class ArrayRing:
+    """
+    Fixed-capacity float64 ring on a preallocated NumPy array.
+
+    Every sample is written twice (slot i and i + capacity), so any run of the
+    newest samples is one contiguous slice: tail() and view() return read-only
+    views in O(1), and callers pay only for what they then read. Samples are
+    addressed by absolute index (start .. count-1), which doubles as the sample's
+    sequence number, so consumers can ask for "what's new since seq i".
+    """
+    def __init__(self, capacity: int, start: int = 0):
+        self.capacity = int(capacity)
+        self._buf = np.zeros(2 * self.capacity, dtype=np.float64)
+        self.start = start      # seq of the first sample (continues numbering across re-creation)
+        self.count = start      # seq of the next sample to be written
+
+    def __len__(self) -> int:
+        return min(self.count - self.start, self.capacity)
+
+    def append(self, x: float):
+        i = self.count % self.capacity
+        self._buf[i] = self._buf[i + self.capacity] = x
+        self.count += 1
+
+    def extend(self, values: np.ndarray):
+        n = len(values)
+        if n > self.capacity:
+            values = values[-self.capacity:]
+        m, cap = len(values), self.capacity
+        start = (self.count + n - m) % cap
+        first = min(m, cap - start)
+        self._buf[start:start + first] = values[:first]
+        self._buf[start + cap:start + cap + first] = values[:first]
+        if m > first:
+            self._buf[:m - first] = values[first:]
+            self._buf[cap:cap + m - first] = values[first:]
+        self.count += n
+
+    def view(self, i0: int, i1: int) -> np.ndarray:
+        """Read-only view of samples with absolute index in [i0, i1), clipped to what is still held."""
+        i0 = max(i0, self.count - len(self))
+        i1 = min(i1, self.count)
+        if i1 <= i0:
+            out = self._buf[:0]
+        else:
+            end = self.count % self.capacity + self.capacity    # slot just past the newest sample
+            out = self._buf[end - (self.count - i0):end - (self.count - i1)]
+        out.flags.writeable = False
+        return out
+
+    def tail(self, k: int) -> np.ndarray:
+        """Read-only view of the newest k samples, oldest first."""
+        return self.view(self.count - k, self.count)
+
+    def search(self, t: float) -> int:
+        """Absolute index of the first held sample >= t (count if none); ring values must be non-decreasing."""
+        held = self.tail(len(self))
+        return self.count - len(held) + int(np.searchsorted(held, t, side="left"))
+
+def ring_capacity(seconds: float, rate_hz: float) -> int:
+    return max(1, int(np.ceil(seconds * rate_hz)))
+
+class MinMaxEnvelope:
+    """
+    Streaming min/max envelope of the DAQ channels at one bucket size (samples per bucket).
+
+    Bucket k covers raw seqs [k*bucket, (k+1)*bucket) and is stored at index k of its rings, so a
+    seq-aligned window maps straight onto buckets and reducing it costs O(buckets), not O(samples).
+    lo_first records whether a bucket's min came before its max, so reduced series keep the shape
+    of a dip.
+    """
+    def __init__(self, bucket: int, capacity: int, names: List[str], next_seq: int):
+        self.bucket = bucket
+        first = -(-next_seq // bucket)
+        self.t_first = ArrayRing(capacity, first)
+        self.t_last = ArrayRing(capacity, first)
+        self.lo = {name: ArrayRing(capacity, first) for name in names}
+        self.hi = {name: ArrayRing(capacity, first) for name in names}
+        self.lo_first = {name: ArrayRing(capacity, first) for name in names}
+        self._skip = first * bucket - next_seq      # samples before the first whole bucket
+        self._times = np.empty(0)
+        self._block = np.empty((len(names), 0))
+
+    def extend(self, times: np.ndarray, block: np.ndarray) -> None:
+        if self._skip:
+            k = min(self._skip, len(times))
+            times, block = times[k:], block[:, k:]
+            self._skip -= k
+        if len(self._times):
+            times = np.concatenate((self._times, times))
+            block = np.concatenate((self._block, block), axis=1)
+        b = self.bucket
+        m = len(times) // b
+        full = m * b
+        if m:
+            tb = times[:full].reshape(m, b)
+            self.t_first.extend(tb[:, 0])
+            self.t_last.extend(tb[:, -1])
+            rows = np.arange(m)
+            for row, name in zip(block, self.lo):
+                vb = row[:full].reshape(m, b)
+                imin, imax = vb.argmin(axis=1), vb.argmax(axis=1)
+                self.lo[name].extend(vb[rows, imin])
+                self.hi[name].extend(vb[rows, imax])
+                self.lo_first[name].extend(imin <= imax)
+        self._times, self._block = times[full:].copy(), block[:, full:].copy()
+
+    def window(self, daq: Tuple[int, int], step: int,
+               names: List[str]) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        Min/max pairs for raw seqs [daq[0], daq[1]) at `step` samples per pair, in the layout of
+        decimate(..., "minmax"); None if step or the window doesn't line up with this envelope's
+        buckets or the window is no longer (or not yet) held.
+        """
+        b = self.bucket
+        if step % b or daq[0] % step or daq[1] % step:
+            return None
+        k0, k1 = daq[0] // b, daq[1] // b
+        if k0 < self.t_first.count - len(self.t_first) or k1 > self.t_first.count:
+            return None
+        r = step // b
+        m = (k1 - k0) // r
+        rows = np.arange(m)
+        t = np.empty(2 * m)
+        t[0::2] = self.t_first.view(k0, k1).reshape(m, r)[:, 0]
+        t[1::2] = self.t_last.view(k0, k1).reshape(m, r)[:, -1]
+        out: Dict[str, np.ndarray] = {}
+        for name in names:
+            lo = self.lo[name].view(k0, k1).reshape(m, r)
+            hi = self.hi[name].view(k0, k1).reshape(m, r)
+            jl, jh = lo.argmin(axis=1), hi.argmax(axis=1)
+            lo_first = np.where(jl == jh, self.lo_first[name].view(k0, k1).reshape(m, r)[rows, jl] > 0, jl < jh)
+            vl, vh = lo[rows, jl], hi[rows, jh]
+            o = np.empty(2 * m)
+            o[0::2] = np.where(lo_first, vl, vh)
+            o[1::2] = np.where(lo_first, vh, vl)
+            out[name] = o
+        return t, out
+
+RIG_FIELDS = ("ctPressure", "whPressure", "ctDepth", "ctWeight", "ctSpeed", "ctFluidRate", "n2FluidRate")
+
 @dataclass
 class RingBuffers:
-    # DAQ buffers
-    raw_pressure: deque = field(default_factory=lambda: deque(maxlen=27000))
-    raw_time: deque = field(default_factory=lambda: deque(maxlen=27000))
-    filt_pressure: deque = field(default_factory=lambda: deque(maxlen=500))
-    speed: deque = field(default_factory=lambda: deque(maxlen=500))
-
-    # Rig signals (named) and shared rig time
-    ctPressure: deque = field(default_factory=lambda: deque(maxlen=500))
-    whPressure: deque = field(default_factory=lambda: deque(maxlen=500))
-    ctDepth: deque     = field(default_factory=lambda: deque(maxlen=500))
-    ctWeight: deque    = field(default_factory=lambda: deque(maxlen=500))
-    ctSpeed: deque     = field(default_factory=lambda: deque(maxlen=500))
-    ctFluidRate: deque = field(default_factory=lambda: deque(maxlen=500))
-    n2FluidRate: deque = field(default_factory=lambda: deque(maxlen=500))
-    rig_time: deque    = field(default_factory=lambda: deque(maxlen=500))
-
-    def snapshot_tail(self, n: int = 200) -> Dict[str, List[float]]:
-        def tail(dq: deque, k: int) -> List[float]:
-            if k >= len(dq):
-                return list(dq)
-            return list(dq)[-k:]
-        return {
-            "rawPressure": tail(self.raw_pressure, n),
-            "rawTime": tail(self.raw_time, n),
-            "filterPressure": tail(self.filt_pressure, n),
-            "tractorSpeed": tail(self.speed, n),
-            "ctPressure": tail(self.ctPressure, n),
-            "whPressure": tail(self.whPressure, n),
-            "ctDepth": tail(self.ctDepth, n),
-            "ctWeight": tail(self.ctWeight, n),
-            "ctSpeed": tail(self.ctSpeed, n),
-            "ctFluidRate": tail(self.ctFluidRate, n),
-            "n2FluidRate": tail(self.n2FluidRate, n),
-            "rigTime": tail(self.rig_time, n),
-        }
+    # DAQ buffers: one shared sample-clock time ring plus one value ring per channel.
+    # All DAQ rings (raw and derived) share raw_time's index, so one search serves them all.
+    # Real sizes come from set_daq_channels() once the sample rate is known.
+    raw_time: ArrayRing = field(default_factory=lambda: ArrayRing(1))
+    raw: Dict[str, ArrayRing] = field(default_factory=lambda: {"ai0": ArrayRing(1)})
+    daq_gaps: deque = field(default_factory=lambda: deque(maxlen=DAQ_GAP_HISTORY))
+    daq_rate_hz: float = 1.0
+    envelopes: List[MinMaxEnvelope] = field(default_factory=list)   # coarsest bucket first
+    filt_pressure: ArrayRing = field(default_factory=lambda: ArrayRing(1))
+    speed: ArrayRing = field(default_factory=lambda: ArrayRing(1))
+
+    # Rig signals (named, see RIG_FIELDS) and shared rig time
+    ctPressure: ArrayRing  = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    whPressure: ArrayRing  = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    ctDepth: ArrayRing     = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    ctWeight: ArrayRing    = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    ctSpeed: ArrayRing     = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    ctFluidRate: ArrayRing = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    n2FluidRate: ArrayRing = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+    rig_time: ArrayRing    = field(default_factory=lambda: ArrayRing(ring_capacity(RIG_RING_SECONDS, RIG_MAX_RATE_HZ)))
+
+    def set_daq_channels(self, names: List[str], sample_rate_hz: float) -> None:
+        """(Re)create the DAQ rings, DAQ_RING_SECONDS long at this rate; called before acquisition starts."""
+        cap = max(ring_capacity(DAQ_RING_SECONDS, sample_rate_hz), DAQ_RING_MIN_SAMPLES)
+        seq = self.raw_time.count           # keep sample seqs monotonic across restarts
+        self.daq_rate_hz = float(sample_rate_hz)
+        self.raw_time = ArrayRing(cap, seq)
+        self.raw = {name: ArrayRing(cap, seq) for name in names}
+        self.filt_pressure = ArrayRing(cap, seq)
+        self.speed = ArrayRing(cap, seq)
+        buckets = sorted({int(round(sample_rate_hz * w)) for w in DAQ_ENVELOPE_BUCKETS_S} - {0, 1}, reverse=True)
+        self.envelopes = [MinMaxEnvelope(b, -(-cap // b), list(names), seq) for b in buckets]
+        self.daq_gaps.clear()
+
+    def restart_rig(self) -> None:
+        """Empty the rig rings (same size, seqs continue); after the host clock stepped back, so rig_time stays ascending."""
+        seq = self.rig_time.count
+        for name in RIG_FIELDS + ("rig_time",):
+            setattr(self, name, ArrayRing(getattr(self, name).capacity, seq))
+
+    # --- time-indexed queries (binary search on the time ring; returned arrays are read-only views) ---
+    @staticmethod
+    def _window(time_ring: ArrayRing, rings: Dict[str, ArrayRing],
+                t0: float, t1: float) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        i0 = time_ring.search(t0)
+        i1 = time_ring.search(t1) if t1 != float("inf") else time_ring.count
+        return time_ring.view(i0, i1), {name: ring.view(i0, i1) for name, ring in rings.items()}
+
+    def daq_rings(self) -> Dict[str, ArrayRing]:
+        return {**self.raw, "filterPressure": self.filt_pressure, "tractorSpeed": self.speed}
+
+    def rig_rings(self) -> Dict[str, ArrayRing]:
+        return {name: getattr(self, name) for name in RIG_FIELDS}
+
+    def daq_since(self, t0: float, t1: float = float("inf")) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """DAQ samples with t0 <= time < t1: (times, {channel / derived series: values})."""
+        return self._window(self.raw_time, self.daq_rings(), t0, t1)
+
+    def daq_last(self, seconds: float) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """DAQ samples from the newest `seconds` (measured back from the newest sample)."""
+        newest = self.raw_time.tail(1)
+        return self.daq_since(newest[0] - seconds if len(newest) else float("inf"))
+
+    def rig_since(self, t0: float, t1: float = float("inf")) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Rig samples with t0 <= time < t1: (times, {RIG_FIELDS name: values})."""
+        return self._window(self.rig_time, self.rig_rings(), t0, t1)
+
+    def rig_last(self, seconds: float) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        newest = self.rig_time.tail(1)
+        return self.rig_since(newest[0] - seconds if len(newest) else float("inf"))
+
+    def gaps_since(self, t: float) -> List[DAQGap]:
+        """Gap markers that end at or after t."""
+        return [g for g in self.daq_gaps if g.t_end >= t]
+
+    # --- seq-indexed access: every DAQ ring shares raw_time's seqs, every rig ring shares rig_time's ---
+    def seq_for_last(self, time_ring: ArrayRing, seconds: float) -> int:
+        """Seq of the first sample within `seconds` of the newest one in time_ring (count if empty)."""
+        newest = time_ring.tail(1)
+        return time_ring.search(newest[0] - seconds) if len(newest) else time_ring.count
+
+    def daq_step(self, sub: "Subscription") -> int:
+        """Samples per bucket for a subscription on the DAQ rings. minmax steps snap down to a multiple
+        of the largest envelope bucket that fits, so they can be served from the envelopes."""
+        step = sub.step(self.daq_rate_hz)
+        if sub.mode == "minmax":
+            fits = [env.bucket for env in self.envelopes if env.bucket <= step]
+            if fits:
+                step = step // fits[0] * fits[0]
+        return step
+
+    def rig_rate_hz(self) -> Optional[float]:
+        """Rig line rate measured over the last RIG_RATE_WINDOW lines (None until there are two)."""
+        t = self.rig_time.tail(RIG_RATE_WINDOW)
+        if len(t) < 2 or t[-1] <= t[0]:
+            return None
+        return (len(t) - 1) / (t[-1] - t[0])
+
+    def rig_step(self, sub: "Subscription") -> int:
+        """Samples per bucket for a subscription on the rig rings, from the measured (irregular) line rate."""
+        rate = self.rig_rate_hz()
+        return sub.step(rate) if rate else 1
+
+    def seq_range(self, time_ring: ArrayRing, since: int, limit: int, step: int = 1) -> Tuple[int, int]:
+        """[first, end) seqs to send a consumer whose next wanted seq is `since`; skips ahead past
+        samples no longer held and keeps only the newest `limit` if it has fallen further behind.
+        Both ends snap to multiples of `step` so decimation buckets line up across clients and ticks."""
+        end = time_ring.count
+        first = max(since, end - len(time_ring), end - limit)
+        first = -(-first // step) * step
+        return first, max(first, end // step * step)
+
+    def window_arrays(self, daq: Tuple[int, int], rig: Tuple[int, int],
+                      streams: Optional[Set[str]] = None) -> Dict[str, np.ndarray]:
+        """Read-only views of DAQ samples with seq in [daq[0], daq[1]) and rig samples in [rig[0], rig[1]):
+        rawTime, one per DAQ channel, derived, rig fields, rigTime. `streams` limits the value series
+        (a group's time series is included when any of its series is)."""
+        out: Dict[str, np.ndarray] = {}
+        for time_name, time_ring, rings, (i0, i1) in (("rawTime", self.raw_time, self.daq_rings(), daq),
+                                                      ("rigTime", self.rig_time, self.rig_rings(), rig)):
+            names = [n for n in rings if streams is None or n in streams]
+            if names:
+                out[time_name] = time_ring.view(i0, i1)
+                out.update((n, rings[n].view(i0, i1)) for n in names)
+        return out
+
+    def envelope_window(self, daq: Tuple[int, int], step: int,
+                        names: List[str]) -> Optional[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """Min/max pairs of DAQ channels from the coarsest envelope that fits (see MinMaxEnvelope.window)."""
+        for env in self.envelopes:
+            out = env.window(daq, step, names)
+            if out is not None:
+                return out
+        return None
+
+    def snapshot_arrays(self, n: int = 200) -> Dict[str, np.ndarray]:
+        """Newest n samples of every series (see window_arrays)."""
+        d, r = self.raw_time.count, self.rig_time.count
+        return self.window_arrays((d - n, d), (r - n, r))
+
+    def stream_json(self, arrays: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """window_arrays -> the JSON stream layout, with the gap markers touching the DAQ window."""
+        out: Dict[str, Any] = {}
+        if "rawTime" in arrays:
+            channels = {name: json_floats(arrays[name]) for name in self.raw if name in arrays}
+            first = next(iter(self.raw), None)
+            raw_time = arrays["rawTime"]
+            since = raw_time[0] if len(raw_time) else float("inf")
+            if first in channels:
+                # first channel keeps the legacy single-series key and is sent only there;
+                # "channels" carries the others
+                out["rawPressure"] = channels.pop(first)
+            out["rawTime"] = raw_time.tolist()
+            out["channels"] = channels
+            # gaps touching the sent window: [t_start, t_end, missing]; don't draw lines across these
+            out["gaps"] = [[g.t_start, g.t_end, g.missing] for g in self.gaps_since(since)]
+        out.update((name, json_floats(arrays[name])) for name in ("filterPressure", "tractorSpeed") + RIG_FIELDS
+                   if name in arrays)
+        if "rigTime" in arrays:
+            out["rigTime"] = arrays["rigTime"].tolist()
+        return out
+
+    def snapshot_tail(self, n: int = 200) -> Dict[str, Any]:
+        return self.stream_json(self.snapshot_arrays(n))
+
+    def extend_daq(self, times: np.ndarray, block: np.ndarray) -> None:
+        """Append one acquisition block: times (n,), block (n_chan, n) in set_daq_channels order."""
+        self.raw_time.extend(times)
+        for ring, row in zip(self.raw.values(), block):
+            ring.extend(row)
+        for env in self.envelopes:
+            env.extend(times, block)
+        # simple placeholder filter / derived (first channel)
+        self.filt_pressure.extend(block[0])
+        self.speed.extend(np.zeros(block.shape[1]))
+
+# ---------------- Alignment ----------------
+class AlignedBlock(NamedTuple):
+    """Joint DAQ + rig frame on a common clock; same shape as a DAQ recorder block."""
+    times: np.ndarray           # (n,) grid times
+    block: np.ndarray           # (n_series, n)
+    names: Tuple[str, ...]
+
+def grid_range(rate_hz: float, cursor: Optional[int], tail: int) -> Tuple[int, int]:
+    """
+    [first, end) indices on the absolute grid t = k / rate_hz that are ready to be aligned: up to
+    ALIGN_DELAY_S before now. A consumer with no cursor starts `tail` points back; one further
+    behind than STREAM_MAX_SAMPLES points skips ahead.
+    """
+    end = int(np.floor((time.time() - ALIGN_DELAY_S) * rate_hz)) + 1
+    first = end - tail if cursor is None else max(cursor, end - STREAM_MAX_SAMPLES)
+    return first, max(first, end)
+
+def align(buffers: RingBuffers, grid: np.ndarray, streams: Optional[Set[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Put DAQ and rig series on one clock (grid: ascending times). DAQ channels and derived series are
+    linearly interpolated; rig values are sample-and-held (the last value at or before each grid time,
+    for up to RIG_HOLD_S). NaN where there is no source: outside the held data or inside a DAQ gap.
+    """
+    out: Dict[str, np.ndarray] = {}
+    if not len(grid):
+        return out
+    daq_names = [n for n in buffers.daq_rings() if streams is None or n in streams]
+    rig_names = [n for n in RIG_FIELDS if streams is None or n in streams]
+    if daq_names:
+        rings = buffers.daq_rings()
+        i0, i1 = buffers.raw_time.search(grid[0]) - 1, buffers.raw_time.search(grid[-1]) + 1
+        t = buffers.raw_time.view(i0, i1)
+        in_gap = np.zeros(len(grid), dtype=bool)
+        for g in buffers.gaps_since(grid[0]):
+            in_gap |= (grid > g.t_start) & (grid < g.t_end)
+        for name in daq_names:
+            v = np.interp(grid, t, rings[name].view(i0, i1), left=np.nan, right=np.nan) if len(t) \
+                else np.full(len(grid), np.nan)
+            v[in_gap] = np.nan
+            out[name] = v
+    if rig_names:
+        j0, j1 = buffers.rig_time.search(grid[0]) - 1, buffers.rig_time.search(grid[-1]) + 1
+        t = buffers.rig_time.view(j0, j1)
+        j = np.searchsorted(t, grid, side="right") - 1
+        held = j >= 0
+        if len(t):
+            held &= grid - t[np.maximum(j, 0)] <= RIG_HOLD_S
+        for name in rig_names:
+            v = getattr(buffers, name).view(j0, j1)
+            out[name] = np.where(held, v[np.maximum(j, 0)], np.nan) if len(v) else np.full(len(grid), np.nan)
+    return out
+
+class Aligner:
+    """Incremental aligned frames at a fixed rate; each grid point is produced once (recorder, detectors)."""
+    def __init__(self, buffers: RingBuffers, rate_hz: float, streams: Optional[Set[str]] = None):
+        self.buffers = buffers
+        self.rate_hz = rate_hz
+        self.streams = streams
+        self.cursor: Optional[int] = None
+
+    def next(self) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        k0, k1 = grid_range(self.rate_hz, self.cursor, 0)
+        self.cursor = k1
+        grid = np.arange(k0, k1) / self.rate_hz
+        return grid, align(self.buffers, grid, self.streams)
+
+async def aligned_feed(buffers: RingBuffers, out_queue: "RecorderQueue", rate_hz: float, period: float = 1.0):
+    """Push AlignedBlocks for the recorder's aligned_blocks table once per period."""
+    aligner = Aligner(buffers, rate_hz)
+    while True:
+        await asyncio.sleep(period)
+        if not out_queue.accepting:
+            # not recording: don't align at all, and start from "now" once a recording begins
+            aligner.cursor = None
+            continue
+        grid, series = aligner.next()
+        # series whose source isn't running (no held data anywhere on the grid) aren't recorded
+        series = {name: v for name, v in series.items() if not np.isnan(v).all()}
+        if len(grid) and series:
+            out_queue.offer(AlignedBlock(grid, np.vstack(list(series.values())), tuple(series)))
+
 
 # ---------------- Recorder (SQLite) ----------------
+class RecorderQueue(asyncio.Queue):
+    """
+    Bounded producer -> Recorder handoff of whole blocks (never single samples). Nothing is queued unless a
+    recording is running; an offer that doesn't fit is refused as a whole and counted rather than raising.
+    """
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.accepting = False      # set by the Recorder while recording
+        self.dropped = 0            # offers refused because the queue was full
+
+    def offer(self, *items) -> bool:
+        """Queue all of items, or none of them."""
+        if not self.accepting:
+            return False
+        if self.maxsize > 0 and self.maxsize - self.qsize() < len(items):
+            self.dropped += 1
+            return False
+        for item in items:
+            self.put_nowait(item)
+        return True
+
+class RecorderFlush(NamedTuple):
+    """Queued behind everything offered so far: the consumer hands its batch to the writer, then sets done."""
+    done: asyncio.Future
+    stop: bool              # the consumer exits after handing off
+
+def load_blocks(conn: sqlite3.Connection, table: str = "daq_blocks",
+                name: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (times, values) of one recorded series from daq_blocks / aligned_blocks, in time order.
+    name=None reads the first series recorded in that table.
+    """
+    if name is None:
+        row = conn.execute(f"SELECT s.name FROM {table} b JOIN series s ON s.id = b.series "
+                           f"ORDER BY b.t0 LIMIT 1;").fetchone()
+        if row is None:
+            return np.empty(0), np.empty(0)
+        name = row[0]
+    rows = conn.execute(f"SELECT b.t0, b.dt, b.n, b.dtype, b.data FROM {table} b JOIN series s ON s.id = b.series "
+                        f"WHERE s.name = ? ORDER BY b.t0;", (name,)).fetchall()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    t = np.concatenate([t0 + dt * np.arange(n) for t0, dt, n, _, _ in rows])
+    x = np.concatenate([np.frombuffer(data, dtype=dtype).astype(np.float64) for _, _, _, dtype, data in rows])
+    return t, x
+
 class Recorder:
     """
     Recorder that consumes queues and writes to SQLite.
-    DAQ queue items: (time: float, value: float, channel: str)
+    DAQ queue items: (times: ndarray (n,), block: ndarray (n_chan, n), channels: tuple of str) — one block per read,
+                     or a DAQGap marker (written to daq_gaps)
+                     or an AlignedBlock (written to aligned_blocks)
     RIG queue items: (time: float, ctP, whP, ctD, ctW, ctS, ctFR, n2FR)
+    Both queues also carry the RecorderFlush markers pause() and stop() use to collect the consumers' batches.
+
+    DAQ and aligned blocks are stored columnar: one row per series per run of back-to-back blocks in a batch,
+    holding the start time, sample spacing, count and the samples packed as a RECORD_DTYPE BLOB (timestamps
+    come from the sample clock, so t0 + i * dt reproduces them). Read them back with load_blocks().
+
+    The loop-side consumers only batch queue items; a "recorder-writer" thread owns the SQLite connection and
+    runs every insert and commit, so fsyncs never stall websocket handling or the broadcaster.
     """
-    def __init__(self,
-                 daq_queue: "asyncio.Queue[Tuple[float, float, str]]",
-                 rig_queue: "asyncio.Queue[Tuple[float, float, float, float, float, float, float, float]]"):
+    def __init__(self, daq_queue: RecorderQueue, rig_queue: RecorderQueue):
         self.daq_q = daq_queue
         self.rig_q = rig_queue
         self._conn: Optional[sqlite3.Connection] = None
+        self._series: Dict[str, int] = {}   # series name -> series.id
         self._task_daq: Optional[asyncio.Task] = None
         self._task_rig: Optional[asyncio.Task] = None
-        self._recording = asyncio.Event()   # when set, writes are performed
+        self._writer: Optional[threading.Thread] = None
+        self._jobs: "queue.Queue[Tuple[str, tuple, Optional[asyncio.Future]]]" = queue.Queue(maxsize=RECORD_WRITER_QUEUE)
+        self._recording = asyncio.Event()   # when set, the queues accept items (see RecorderQueue.accepting)
         self.folder: Optional[Path] = None
         self.db_path: Optional[Path] = None
-        self._stop_evt = asyncio.Event()
 
     def configured(self) -> bool:
         return self.db_path is not None
@@ -173,10 +785,19 @@ class Recorder:
             cur.execute("PRAGMA synchronous=NORMAL;")
             cur.execute("PRAGMA temp_store=MEMORY;")
             cur.execute("""
-                CREATE TABLE IF NOT EXISTS daq_samples(
-                    time REAL NOT NULL,
-                    value REAL NOT NULL,
-                    channel TEXT NOT NULL
+                CREATE TABLE IF NOT EXISTS series(
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL UNIQUE
+                );
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS daq_blocks(
+                    t0 REAL NOT NULL,
+                    dt REAL NOT NULL,
+                    series INTEGER NOT NULL REFERENCES series(id),
+                    n INTEGER NOT NULL,
+                    dtype TEXT NOT NULL,
+                    data BLOB NOT NULL
                 );
             """)
             cur.execute("""
@@ -191,8 +812,27 @@ class Recorder:
                     n2FluidRate REAL
                 );
             """)
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_daq_time ON daq_samples(time);")
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS aligned_blocks(
+                    t0 REAL NOT NULL,
+                    dt REAL NOT NULL,
+                    series INTEGER NOT NULL REFERENCES series(id),
+                    n INTEGER NOT NULL,
+                    dtype TEXT NOT NULL,
+                    data BLOB NOT NULL
+                );
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS daq_gaps(
+                    time_start REAL NOT NULL,
+                    time_end REAL NOT NULL,
+                    first_index INTEGER NOT NULL,
+                    missing INTEGER NOT NULL
+                );
+            """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_daq_blocks ON daq_blocks(series, t0);")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_rig_time ON rig_samples(time);")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_aligned_blocks ON aligned_blocks(series, t0);")
             conn.commit()
         finally:
             conn.close()
@@ -206,43 +846,141 @@ class Recorder:
         if self._task_daq and not self._task_daq.done():
             # already running; just set recording flag
             self._recording.set()
+            self.daq_q.accepting = self.rig_q.accepting = True
             log("Recorder already running — resumed writing.", "info")
             return
 
-        # open DB connection used by consumer tasks
-        self._open_db()
+        # the writer thread opens (and from then on owns) the DB connection; wait for it so errors surface here
+        self._writer = threading.Thread(target=self._write_loop, args=(asyncio.get_running_loop(),),
+                                        name="recorder-writer", daemon=True)
+        self._writer.start()
+        try:
+            await self._submit("open", wait=True)
+        except Exception:
+            await self._stop_writer()
+            raise
         self._recording.set()
-        self._stop_evt.clear()
+        self.daq_q.accepting = self.rig_q.accepting = True
         self._task_daq = asyncio.create_task(self._consume_daq())
         self._task_rig = asyncio.create_task(self._consume_rig())
         log("Recorder started.", "success")
 
     async def pause(self):
         self._recording.clear()
+        self.daq_q.accepting = self.rig_q.accepting = False
+        await self._flush_consumers(stop=False)
+        if self._writer:
+            # everything queued before the pause is on disk once pause_recording is acknowledged
+            await self._submit("flush", wait=True)
         log("Recorder paused.", "info")
 
     async def stop(self):
         self._recording.clear()
-        self._stop_evt.set()
+        self.daq_q.accepting = self.rig_q.accepting = False
         tasks = [t for t in (self._task_daq, self._task_rig) if t]
-        if tasks:
-            for t in tasks:
-                t.cancel()
-            await asyncio.gather(*tasks, return_exceptions=True)
+        # consumers hand off their last batches and exit; waited for, never cancelled, so nothing is dropped
+        await self._flush_consumers(stop=True)
+        await asyncio.gather(*tasks, return_exceptions=True)
         self._task_daq = self._task_rig = None
-        self._close_db()
+        await self._stop_writer()
         log("Recorder stopped.", "success")
 
+    async def _flush_consumers(self, stop: bool):
+        """Have both consumers hand what is queued and batched so far to the writer (in order, before any later job)."""
+        async def flush(q: RecorderQueue, task: Optional[asyncio.Task]):
+            if task is None or task.done():
+                return
+            done = asyncio.get_running_loop().create_future()
+            await q.put(RecorderFlush(done, stop))
+            # a consumer that dies never answers
+            await asyncio.wait((done, task), return_when=asyncio.FIRST_COMPLETED)
+        await asyncio.gather(flush(self.daq_q, self._task_daq), flush(self.rig_q, self._task_rig))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recording": self._recording.is_set(),
+            "daq_queue": self.daq_q.qsize(),
+            "daq_dropped": self.daq_q.dropped,
+            "rig_dropped": self.rig_q.dropped,
+        }
+
+    # ---- writer thread ----
+    async def _submit(self, kind: str, *args, wait: bool = False) -> None:
+        """
+        Hand a job to the writer thread. Jobs run in order, so a waited-on job ("flush", "stop") is acknowledged
+        only after every batch submitted before it is committed. A full handoff queue makes the caller wait
+        (off the loop) instead of dropping the batch.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future() if wait else None
+        job = (kind, args, fut)
+        try:
+            self._jobs.put_nowait(job)
+        except queue.Full:
+            await loop.run_in_executor(None, self._jobs.put, job)
+        if fut is not None:
+            await fut
+
+    async def _stop_writer(self):
+        if not self._writer:
+            return
+        try:
+            await self._submit("stop", wait=True)
+        except Exception as e:
+            log(f"Recorder close error: {e}", "error")
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+        self._writer = None
+
+    @staticmethod
+    def _settle(fut: asyncio.Future, err: Optional[BaseException]):
+        if fut.done():
+            return
+        if err is None:
+            fut.set_result(None)
+        else:
+            fut.set_exception(err)
+
+    def _write_loop(self, loop: asyncio.AbstractEventLoop):
+        """Writer thread: the only code that touches the SQLite connection."""
+        while True:
+            kind, args, fut = self._jobs.get()
+            err = None
+            try:
+                if kind == "daq":
+                    self._write_daq(*args)
+                elif kind == "rig":
+                    self._write_rig(*args)
+                elif kind == "open":
+                    self._open_db()
+                elif kind == "flush":
+                    if self._conn:
+                        self._conn.commit()
+                elif kind == "stop":
+                    self._close_db()
+            except Exception as e:
+                err = e
+                if fut is None:
+                    log(f"Recorder {kind.upper()} write error: {e}", "error")
+            if fut is not None:
+                try:
+                    loop.call_soon_threadsafe(self._settle, fut, err)
+                except RuntimeError:
+                    # loop already closed during shutdown
+                    pass
+            if kind == "stop":
+                return
+
     def _open_db(self):
         if self._conn:
             return
         assert self.db_path is not None
-        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn = sqlite3.connect(self.db_path)
         cur = self._conn.cursor()
         cur.execute("PRAGMA journal_mode=WAL;")
         cur.execute("PRAGMA synchronous=NORMAL;")
         cur.execute("PRAGMA temp_store=MEMORY;")
         self._conn.commit()
+        self._series = dict(cur.execute("SELECT name, id FROM series;").fetchall())
 
     def _close_db(self):
         if self._conn:
@@ -256,113 +994,336 @@ class Recorder:
                 pass
             self._conn = None
 
-    async def _consume_daq(self):
-        assert self._conn is not None
+    def _series_id(self, cur: sqlite3.Cursor, name: str) -> int:
+        sid = self._series.get(name)
+        if sid is None:
+            cur.execute("INSERT OR IGNORE INTO series(name) VALUES (?);", (name,))
+            sid = self._series[name] = cur.execute("SELECT id FROM series WHERE name = ?;", (name,)).fetchone()[0]
+        return sid
+
+    @staticmethod
+    def _merge_blocks(batch: List[Tuple[np.ndarray, np.ndarray, Tuple[str, ...]]]):
+        """
+        Join back-to-back blocks (same series, next block starting one sample spacing after the last) so
+        the row size doesn't depend on the read size; a gap, clock step or change of series starts a new run.
+        """
+        run: List[Tuple[np.ndarray, np.ndarray]] = []
+        run_chans: Optional[Tuple[str, ...]] = None
+        first = last = 0.0
+        count = 0
+
+        def joined():
+            if len(run) == 1:
+                return run[0][0], run[0][1], run_chans
+            return (np.concatenate([t for t, _ in run]), np.concatenate([b for _, b in run], axis=1), run_chans)
+
+        for times, block, chans in batch:
+            n = len(times)
+            if not n:
+                continue
+            if run:
+                gap = float(times[0]) - last
+                ref = (last - first) / (count - 1) if count > 1 else \
+                    (float(times[-1]) - float(times[0])) / (n - 1) if n > 1 else gap
+                if chans == run_chans and gap > 0 and abs(gap - ref) <= ref / 2:
+                    run.append((times, block))
+                    last = float(times[-1])
+                    count += n
+                    continue
+                yield joined()
+            run, run_chans = [(times, block)], chans
+            first, last, count = float(times[0]), float(times[-1]), n
+        if run:
+            yield joined()
+
+    def _block_rows(self, cur: sqlite3.Cursor, batch: List[Tuple[np.ndarray, np.ndarray, Tuple[str, ...]]]):
+        # one (t0, dt, series, n, dtype, data) row per channel per run of contiguous blocks
+        dtype = np.dtype(RECORD_DTYPE)
+        for times, block, chans in self._merge_blocks(batch):
+            n = len(times)
+            if not n:
+                continue
+            t0 = float(times[0])
+            dt = (float(times[-1]) - t0) / (n - 1) if n > 1 else 0.0
+            packed = np.ascontiguousarray(block, dtype=dtype)
+            for row, chan in zip(packed, chans):
+                yield t0, dt, self._series_id(cur, chan), n, dtype.str, row.tobytes()
+
+    def _write_daq(self, batch, gaps: List[DAQGap], aligned: List[AlignedBlock]):
         cur = self._conn.cursor()
-        batch: List[Tuple[float, float, str]] = []
+        # materialised first: _series_id() may insert through the same cursor
+        cur.executemany("INSERT INTO daq_blocks(t0,dt,series,n,dtype,data) VALUES (?,?,?,?,?,?);",
+                        list(self._block_rows(cur, batch)))
+        if aligned:
+            cur.executemany("INSERT INTO aligned_blocks(t0,dt,series,n,dtype,data) VALUES (?,?,?,?,?,?);",
+                            list(self._block_rows(cur, aligned)))
+        if gaps:
+            cur.executemany("INSERT INTO daq_gaps(time_start,time_end,first_index,missing) VALUES (?,?,?,?);", gaps)
+        self._conn.commit()
+
+    def _write_rig(self, batch: List[Tuple[float, float, float, float, float, float, float, float]]):
+        self._conn.executemany(
+            "INSERT INTO rig_samples(time,ctPressure,whPressure,ctDepth,ctWeight,ctSpeed,ctFluidRate,n2FluidRate) VALUES (?,?,?,?,?,?,?,?);",
+            batch,
+        )
+        self._conn.commit()
+
+    # ---- consumers (loop side): batch queue items, hand batches to the writer ----
+    @staticmethod
+    async def _drain(q: RecorderQueue, timeout: float = 0.25) -> list:
+        """Everything queued right now, waiting up to timeout for the first item: one timer per wakeup, not per item."""
+        items = []
+        if q.empty() and timeout > 0:
+            try:
+                items.append(await asyncio.wait_for(q.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                return items
+        while True:
+            try:
+                items.append(q.get_nowait())
+            except asyncio.QueueEmpty:
+                return items
+
+    async def _consume_daq(self):
+        batch: List[Tuple[np.ndarray, np.ndarray, Tuple[str, ...]]] = []
+        gaps: List[DAQGap] = []
+        aligned: List[AlignedBlock] = []
+        batch_samples = 0
         last_flush = time.perf_counter()
         try:
-            while not self._stop_evt.is_set():
-                try:
-                    item = await asyncio.wait_for(self.daq_q.get(), timeout=0.25)
-                except asyncio.TimeoutError:
-                    item = None
-                if item and self._recording.is_set():
-                    # item: (t, value, channel)
-                    batch.append(item)
+            while True:
+                flush: Optional[RecorderFlush] = None
+                for item in await self._drain(self.daq_q):
+                    if isinstance(item, RecorderFlush):
+                        flush = item
+                    elif isinstance(item, DAQGap):
+                        gaps.append(item)
+                    elif isinstance(item, AlignedBlock):
+                        aligned.append(item)
+                    else:
+                        # item: (times, block, channels)
+                        batch.append(item)
+                        batch_samples += item[1].size
                 now = time.perf_counter()
-                if batch and (now - last_flush > 0.5 or len(batch) >= 1000):
-                    try:
-                        cur.executemany("INSERT INTO daq_samples(time,value,channel) VALUES (?,?,?);", batch)
-                        self._conn.commit()
-                    except Exception as e:
-                        log(f"Recorder DAQ write error: {e}", "error")
-                    batch.clear()
+                due = flush is not None or now - last_flush > 0.5 or batch_samples >= 1000
+                if (batch or gaps or aligned) and due:
+                    # the writer owns the lists from here on
+                    await self._submit("daq", batch, gaps, aligned)
+                    batch, gaps, aligned = [], [], []
+                    batch_samples = 0
                     last_flush = now
+                if flush is not None:
+                    flush.done.set_result(None)
+                    if flush.stop:
+                        break
         finally:
-            if batch:
-                try:
-                    cur.executemany("INSERT INTO daq_samples(time,value,channel) VALUES (?,?,?);", batch)
-                    self._conn.commit()
-                except Exception as e:
-                    log(f"Recorder final DAQ write error: {e}", "error")
+            if batch or gaps or aligned:
+                await self._submit("daq", batch, gaps, aligned)
 
     async def _consume_rig(self):
-        assert self._conn is not None
-        cur = self._conn.cursor()
         batch: List[Tuple[float, float, float, float, float, float, float, float]] = []
         last_flush = time.perf_counter()
         try:
-            while not self._stop_evt.is_set():
-                try:
-                    item = await asyncio.wait_for(self.rig_q.get(), timeout=0.25)
-                except asyncio.TimeoutError:
-                    item = None
-                if item and self._recording.is_set():
-                    # item is full 8-tuple
-                    batch.append(item)
+            while True:
+                flush: Optional[RecorderFlush] = None
+                for item in await self._drain(self.rig_q):
+                    if isinstance(item, RecorderFlush):
+                        flush = item
+                    else:
+                        # items are full 8-tuples
+                        batch.append(item)
                 now = time.perf_counter()
-                if batch and (now - last_flush > 1.0 or len(batch) >= 500):
-                    try:
-                        cur.executemany(
-                            "INSERT INTO rig_samples(time,ctPressure,whPressure,ctDepth,ctWeight,ctSpeed,ctFluidRate,n2FluidRate) VALUES (?,?,?,?,?,?,?,?);",
-                            batch,
-                        )
-                        self._conn.commit()
-                    except Exception as e:
-                        log(f"Recorder RIG write error: {e}", "error")
-                    batch.clear()
+                if batch and (flush is not None or now - last_flush > 1.0 or len(batch) >= 500):
+                    await self._submit("rig", batch)
+                    batch = []
                     last_flush = now
+                if flush is not None:
+                    flush.done.set_result(None)
+                    if flush.stop:
+                        break
         finally:
             if batch:
-                try:
-                    cur.executemany(
-                        "INSERT INTO rig_samples(time,ctPressure,whPressure,ctDepth,ctWeight,ctSpeed,ctFluidRate,n2FluidRate) VALUES (?,?,?,?,?,?,?,?);",
-                        batch,
-                    )
-                    self._conn.commit()
-                except Exception as e:
-                    log(f"Recorder final RIG write error: {e}", "error")
+                await self._submit("rig", batch)
 
-# ---------------- DAQ Session ----------------
+# ---------------- DAQ Config ----------------
 @dataclass
 class DAQConfig:
     device: Optional[str] = None         # None => auto-discover
     channels: List[str] = field(default_factory=lambda: ["ai0"])
     sample_rate_hz: float = 20.0
+    mode: str = "thread"                 # "thread" | "process" (acquire in a child process via shared memory)
+    read_mode: str = "poll"              # "poll" (blocking chunk reads) | "event" (every-N-samples callbacks)
+    backend: str = "nidaqmx"             # key into DAQ_BACKENDS ("nidaqmx" | "sim")
+    measurement: str = "voltage"         # "voltage" | "current" (4-20 mA, internal shunt)
+    sim: Dict[str, Any] = field(default_factory=dict)   # overrides for SIM_DEFAULTS
+    calibration: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # channel -> ChannelCalibration fields
+    target_latency_ms: float = DAQ_TARGET_LATENCY_MS
+
+    def chunk_plan(self) -> Tuple[int, int, int]:
+        """(target chunk, max chunk, driver buffer size) in samples per channel."""
+        fs = self.sample_rate_hz
+        chunk = max(1, int(round(fs * self.target_latency_ms / 1000.0)))
+        max_chunk = max(chunk, min(chunk * DAQ_CHUNK_GROWTH, int(fs)))
+        return chunk, max_chunk, max(int(fs), max_chunk * 4)
 
-class DAQSession:
-    def __init__(self, buffers: RingBuffers, out_queue: "asyncio.Queue[Tuple[float, float, str]]"):
-        self.cfg = DAQConfig()
-        self.buffers = buffers
-        self._task: Optional[asyncio.Task] = None
-        self._running = asyncio.Event()
-        self._daq_out_q = out_queue
-
-    def configure(self, **kwargs):
-        if self._task and not self._task.done():
-            raise RuntimeError("Stop DAQ before reconfiguring.")
-        for k, v in kwargs.items():
-            if hasattr(self.cfg, k):
-                setattr(self.cfg, k, v)
-        log(f"DAQ configured: {self.cfg}", "success")
+@dataclass
+class ChannelCalibration:
+    """
+    Raw reading (A or V) -> engineering units for one channel.
+    Current channels default to the old server's raw_to_psi: 4-20 mA -> 0-15000 psi.
+    Voltage channels pass raw volts through unless given a calibration; an explicit
+    "linear" one defaults to that same loop seen across the shunt (1-5 V).
+    """
+    kind: str = "linear"                 # "linear" | "poly" | "none" (pass raw units through)
+    in_min: float = LOOP_MIN_A
+    in_max: float = LOOP_MAX_A
+    out_min: float = 0.0
+    out_max: float = PSI_FULL_SCALE
+    coeffs: List[float] = field(default_factory=list)   # poly: np.polyval order (highest power first)
+    clamp: bool = True                   # clip to [out_min, out_max]
+    open_loop_below: Optional[float] = OPEN_LOOP_A      # raw below this => NaN
+
+    @classmethod
+    def for_measurement(cls, measurement: str, **overrides) -> "ChannelCalibration":
+        if measurement == "voltage":
+            # the wiring isn't known: no scaling or open-loop NaNs unless asked for
+            base = dict(kind="none", in_min=LOOP_MIN_A * SHUNT_OHMS, in_max=LOOP_MAX_A * SHUNT_OHMS,
+                        open_loop_below=None)
+            if overrides.get("kind") == "linear":
+                base["open_loop_below"] = OPEN_LOOP_A * SHUNT_OHMS
+        else:
+            base = {}
+        cal = cls(**{**base, **overrides})
+        if cal.kind not in ("linear", "poly", "none"):
+            raise ValueError(f"unknown calibration kind {cal.kind!r}")
+        if cal.kind == "poly" and not cal.coeffs:
+            raise ValueError("poly calibration needs coeffs")
+        return cal
+
+class BlockCalibrator:
+    """
+    Applies one ChannelCalibration per row of a (n_chan, n) block. Linear and
+    pass-through rows share a single broadcast multiply-add; polynomial rows use
+    np.polyval. Samples below a channel's open-loop threshold become NaN and
+    open_loop records which channels saw that in the last block.
+    """
+    def __init__(self, cals: List[ChannelCalibration]):
+        col = lambda vals: np.array(vals, dtype=np.float64).reshape(-1, 1)
+        gain, offset, lo, hi, thr = [], [], [], [], []
+        self.poly: List[Tuple[int, np.ndarray]] = []
+        for i, c in enumerate(cals):
+            if c.kind == "linear":
+                g = (c.out_max - c.out_min) / (c.in_max - c.in_min)
+                gain.append(g)
+                offset.append(c.out_min - c.in_min * g)
+            else:
+                gain.append(1.0)
+                offset.append(0.0)
+                if c.kind == "poly":
+                    self.poly.append((i, np.asarray(c.coeffs, dtype=np.float64)))
+            clamp = c.clamp and c.kind != "none"
+            lo.append(min(c.out_min, c.out_max) if clamp else -np.inf)
+            hi.append(max(c.out_min, c.out_max) if clamp else np.inf)
+            thr.append(c.open_loop_below if c.open_loop_below is not None else -np.inf)
+        self.gain, self.offset, self.lo, self.hi, self.thr = map(col, (gain, offset, lo, hi, thr))
+        self.open_loop = np.zeros(len(cals), dtype=bool)
+
+    def apply(self, raw: np.ndarray) -> np.ndarray:
+        out = raw * self.gain + self.offset
+        for i, coeffs in self.poly:
+            out[i] = np.polyval(coeffs, raw[i])
+        np.clip(out, self.lo, self.hi, out=out)
+        broken = raw < self.thr
+        self.open_loop = broken.any(axis=1)
+        out[broken] = np.nan
+        return out
+
+class SampleClock:
+    """
+    Derives sample timestamps from the sample clock instead of the host clock.
+
+    The first block anchors t0 from the wall clock (back-calculated from the read
+    time, as the old server did); after that sample i is stamped t0 + i / fs.
+    Each read compares the wall clock with the predicted time of the block's last
+    sample and slews t0 by a small fraction of the error, so slow drift between
+    the DAQ timebase and the host clock is corrected without read jitter leaking
+    into the timestamps. An error beyond DAQ_CLOCK_STEP_S is a step of the host
+    clock (NTP, manual set): t0 re-anchors at once so DAQ stamps stay comparable
+    with host-stamped rig lines, and the stamps jump (DAQSession marks the jump).
+    """
+    def __init__(self, sample_rate_hz: float, gain: float = DAQ_CLOCK_GAIN):
+        self.fs = float(sample_rate_hz)
+        self.gain = gain
+        self.t0: Optional[float] = None
+        self.index = 0          # index of the next sample to be stamped
+        self.steps = 0          # host clock steps re-anchored
+
+    def reset(self):
+        self.t0 = None
+        self.index = 0
+
+    def skip(self, n: int):
+        """n samples were lost (overrun); the sample clock kept running."""
+        self.index += n
+
+    def stamp(self, n: int, t_read: Optional[float] = None, behind: int = 0) -> np.ndarray:
+        """Timestamps for the next n samples, read at wall-clock time t_read with `behind` newer samples
+        still unread in the driver buffer (so draining a backlog doesn't look like a clock step)."""
+        if t_read is None:
+            t_read = time.time()
+        if self.t0 is None:
+            self.t0 = t_read - (n + behind - 1) / self.fs
+        else:
+            err = t_read - (self.t0 + (self.index + n + behind - 1) / self.fs)
+            if abs(err) > DAQ_CLOCK_STEP_S:
+                self.t0 += err
+                self.steps += 1
+            elif err < 0:
+                # samples can't arrive before they were taken: the clock runs ahead.
+                # Pull back quickly, but by less than a sample so stamps stay monotonic.
+                self.t0 += max(err, -0.5 / self.fs)
+            else:
+                # positive error is read latency + drift; only follow it slowly
+                self.t0 += self.gain * err
+        times = self.t0 + (self.index + np.arange(n)) / self.fs
+        self.index += n
+        return times
+
+# ---------------- DAQ Backends ----------------
+class DAQOverrun(Exception):
+    """The driver buffer overran; the reader skipped `lost` samples per channel to the oldest still held."""
+    def __init__(self, lost: int):
+        super().__init__(f"DAQ buffer overrun, {lost} samples lost")
+        self.lost = lost
+
+class DAQBackend(abc.ABC):
+    """
+    Driver seam used by DAQSession and acquire_blocks.
+
+    open() returns (task, reader): the task must support the context-manager
+    protocol, start() and register_every_n_samples_acquired_into_buffer_event();
+    the reader must offer nidaqmx's read_many_sample(buf,
+    number_of_samples_per_channel, timeout), an `available` property (unread
+    samples per channel) and raise DAQOverrun when unread samples were lost;
+    `resync_lost` is how many more samples per channel the last successful read
+    had to skip past (0 unless repositioning after an overrun raced the driver).
+    Register new backends in DAQ_BACKENDS; a backend missing either method fails
+    when it is constructed.
+    """
+    @abc.abstractmethod
+    def discover_device(self) -> str:
+        ...
 
-    async def start(self):
-        if self._task and not self._task.done():
-            log("DAQ already running.", "warn")
-            return
-        self._running.set()
-        self._task = asyncio.create_task(self._run())
-        log("DAQ started.", "success")
+    @abc.abstractmethod
+    def open(self, cfg: "DAQConfig", chan_list: List[str], buffer_size: int):
+        ...
 
-    async def stop(self):
-        self._running.clear()
-        if self._task:
-            self._task.cancel()
-            await asyncio.gather(self._task, return_exceptions=True)
-            log("DAQ stopped.", "success")
+class NidaqmxBackend(DAQBackend):
+    def __init__(self):
+        if nidaqmx is None:
+            raise RuntimeError("nidaqmx is not installed; use backend \"sim\".")
 
-    def _auto_device(self) -> str:
+    def discover_device(self) -> str:
         system = nidaqmx.system.System.local()
         if not system.devices:
             raise RuntimeError("No NI devices found.")
@@ -382,68 +1343,845 @@ class DAQSession:
             pass
         return ch.name
 
-    async def _run(self):
-        device = self.cfg.device or self._auto_device()
-        chan_list = [f"{device}/{ch}" for ch in self.cfg.channels]
-        sr = self.cfg.sample_rate_hz
-
+    def open(self, cfg, chan_list, buffer_size):
+        task = nidaqmx.Task()
         try:
-            with nidaqmx.Task() as task:
-                for ch in chan_list:
+            for ch in chan_list:
+                if cfg.measurement == "current":
+                    task.ai_channels.add_ai_current_chan(
+                        physical_channel=ch,
+                        min_val=LOOP_MIN_A, max_val=LOOP_MAX_A,
+                        units=CurrentUnits.AMPS,
+                        shunt_resistor_loc=CurrentShuntResistorLocation.INTERNAL,
+                    )
+                else:
                     task.ai_channels.add_ai_voltage_chan(ch)
-                task.timing.cfg_samp_clk_timing(rate=sr, sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS)
+            task.timing.cfg_samp_clk_timing(rate=cfg.sample_rate_hz, sample_mode=AcquisitionType.CONTINUOUS,
+                                            samps_per_chan=buffer_size)
+            return task, NidaqmxReader(task)
+        except Exception:
+            task.close()
+            raise
+
+class NidaqmxReader:
+    """
+    AnalogMultiChannelReader that tracks its own absolute read position.
+    The task overwrites unread samples instead of erroring out and stopping, so
+    after an overrun the reader jumps to the oldest sample still buffered and
+    reports exactly how many were skipped (DAQOverrun) while the sample clock
+    keeps running. Reads normally continue from the current read position;
+    `pos` is only a Python-side counter, because DAQmx's ReadOffset is an int32
+    and an absolute sample count passes 2^31 within a day at 30 kS/s. After an
+    overrun the next read is addressed with a small negative offset from the most
+    recent sample instead. Samples acquired between computing that offset and the
+    read move the reference forward, so after the read `pos` is re-synced from
+    the driver's curr_read_pos and the extra skip is reported as resync_lost.
+    """
+    # DAQmx: samples no longer available / requested position already overwritten
+    OVERRUN_ERRORS = (-200279, -200277)
+
+    def __init__(self, task):
+        self.stream = task.in_stream
+        self.stream.over_write = OverwriteMode.OVERWRITE_UNREAD_SAMPLES
+        self.stream.relative_to = ReadRelativeTo.CURRENT_READ_POSITION
+        self.stream.offset = 0
+        self.buffer_size = self.stream.input_buf_size
+        self._reader = AnalogMultiChannelReader(self.stream)
+        self.pos = 0
+        self._resync = False        # next read must be repositioned to `pos`
+        self.resync_lost = 0        # extra samples skipped by the last read (see class docstring)
+
+    @property
+    def available(self) -> int:
+        return self.stream.total_samp_per_chan_acquired - self.pos
+
+    def _skip_overwritten(self):
+        lost = self.available - self.buffer_size + int(self.buffer_size * DAQ_OVERRUN_MARGIN)
+        lost = max(lost, 1)
+        self.pos += lost
+        self._resync = True
+        raise DAQOverrun(lost)
+
+    def read_many_sample(self, data: np.ndarray, number_of_samples_per_channel: int, timeout: float = 10.0) -> int:
+        if self.available > self.buffer_size:
+            self._skip_overwritten()
+        if self._resync:
+            # within one buffer of the newest sample, so the offset stays small
+            self.stream.relative_to = ReadRelativeTo.MOST_RECENT_SAMPLE
+            self.stream.offset = self.pos - self.stream.total_samp_per_chan_acquired
+        try:
+            n = self._reader.read_many_sample(data, number_of_samples_per_channel=number_of_samples_per_channel,
+                                              timeout=timeout)
+        except DaqReadError as e:
+            if e.error_code in self.OVERRUN_ERRORS:
+                self._skip_overwritten()
+            raise
+        if self._resync:
+            # the read position now follows on from this read
+            self.stream.relative_to = ReadRelativeTo.CURRENT_READ_POSITION
+            self.stream.offset = 0
+            self._resync = False
+            # where the read really started: later than `pos` if samples arrived after the offset was set
+            start = self.stream.curr_read_pos - n
+            self.resync_lost = max(0, start - self.pos)
+            self.pos = start + n
+            return n
+        self.resync_lost = 0
+        self.pos += n
+        return n
+
+class SimulatedBackend(DAQBackend):
+    """Hardware-free backend: 4-20 mA (or shunt voltage) streams from synthetic dips or a replayed job."""
+    def discover_device(self) -> str:
+        return "Sim1"
+
+    def open(self, cfg, chan_list, buffer_size):
+        if cfg.sample_rate_hz > SIM_MAX_RATE_HZ:
+            raise ValueError(f"simulated sample rate limited to {SIM_MAX_RATE_HZ} S/s")
+        params = {**SIM_DEFAULTS, **cfg.sim}
+        sources = []
+        for i, _ in enumerate(chan_list):
+            if params["source"] == "replay":
+                sources.append(ReplaySignal(cfg.sample_rate_hz, params["path"]))
+            else:
+                sources.append(DipSignal(cfg.sample_rate_hz, {**params, "seed": params["seed"] + i}))
+        task = SimulatedTask(cfg.sample_rate_hz, sources, cfg.measurement, buffer_size)
+        return task, SimulatedReader(task.in_stream)
+
+DAQ_BACKENDS: Dict[str, Callable[[], DAQBackend]] = {
+    "nidaqmx": NidaqmxBackend,
+    "sim": SimulatedBackend,
+}
+
+# ---------------- Simulated DAQ ----------------
+def psi_to_current(psi: np.ndarray) -> np.ndarray:
+    return LOOP_MIN_A + np.asarray(psi) * ((LOOP_MAX_A - LOOP_MIN_A) / PSI_FULL_SCALE)
+
+class DipSignal:
+    """
+    Streaming, block-vectorized version of simulate_stream_array (dipdetector.py):
+    noisy pressure around mean_level with Hann-shaped dips at jittered periods.
+    Blocks must be requested in order.
+    """
+    def __init__(self, fs: float, params: Dict[str, Any]):
+        self.fs = float(fs)
+        self.p = params
+        self.rng = np.random.default_rng(params["seed"])
+        self._next_dip = self.rng.uniform(*params["period_s_jitter"])
+        self._dips: List[float] = []
+
+    def generate(self, start: int, n: int) -> np.ndarray:
+        p = self.p
+        t = (start + np.arange(n)) / self.fs
+        x = p["mean_level"] + self.rng.normal(0.0, p["noise_sigma"], n)
+        t_end = (start + n) / self.fs
+        while self._next_dip < t_end:
+            self._dips.append(self._next_dip)
+            self._next_dip += self.rng.uniform(*p["period_s_jitter"])
+        dur = max(p["dip_duration_s"], 1e-9)
+        for s0 in self._dips:
+            i0, i1 = np.searchsorted(t, (s0, s0 + dur))
+            if i1 > i0:
+                phase = (t[i0:i1] - s0) / dur
+                x[i0:i1] -= p["dip_depth"] * 0.5 * (1 - np.cos(2 * np.pi * phase))
+        # keep only dips that can still reach future blocks
+        self._dips = [s0 for s0 in self._dips if s0 + dur > t_end]
+        return x
+
+class ReplaySignal:
+    """
+    Loops a recorded pressure trace at any sample rate by linear interpolation.
+    Accepts the old server's CSV logs (daq_timestamp, daq_rawPressure columns)
+    or a recorder job.sqlite (daq_blocks, first channel).
+    """
+    def __init__(self, fs: float, path: Optional[str]):
+        if not path:
+            raise ValueError("sim replay needs sim.path")
+        self.fs = float(fs)
+        self.t, self.x = self._load(Path(path).expanduser())
+        if len(self.t) < 2:
+            raise ValueError(f"not enough samples to replay in {path}")
+        self.duration = self.t[-1] - self.t[0]
+
+    @staticmethod
+    def _load(path: Path) -> Tuple[np.ndarray, np.ndarray]:
+        if path.suffix.lower() in (".sqlite", ".db"):
+            conn = sqlite3.connect(path)
+            try:
+                return load_blocks(conn, "daq_blocks")
+            finally:
+                conn.close()
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        t = np.array([float(r["daq_timestamp"]) for r in rows])
+        x = np.array([float(r["daq_rawPressure"]) for r in rows])
+        order = np.argsort(t, kind="stable")
+        return t[order], x[order]
+
+    def generate(self, start: int, n: int) -> np.ndarray:
+        tq = self.t[0] + np.mod((start + np.arange(n)) / self.fs, self.duration)
+        return np.interp(tq, self.t, self.x)
+
+class SimulatedInStream:
+    """Sample-clocked stand-in for nidaqmx's in_stream: samples 'arrive' at fs in real time."""
+    def __init__(self, task: "SimulatedTask"):
+        self.task = task
+        self.read_pos = 0
+
+    @property
+    def total_samp_per_chan_acquired(self) -> int:
+        t = self.task
+        if t._t_start is None:
+            return 0
+        return int((time.monotonic() - t._t_start) * t.fs)
+
+    @property
+    def avail_samp_per_chan(self) -> int:
+        return self.total_samp_per_chan_acquired - self.read_pos
+
+class SimulatedTask:
+    """
+    Subset of nidaqmx.Task used by acquire_blocks, backed by one signal source per
+    channel (pressure in psi, emitted as loop current or shunt voltage). Fires
+    every-N-samples events from a timer thread on the same schedule the hardware
+    would, so event mode can be exercised without a device.
+    """
+    def __init__(self, fs: float, sources: List[Any], measurement: str, buffer_size: int):
+        self.fs = float(fs)
+        self.sources = sources
+        self.measurement = measurement
+        self.buffer_size = buffer_size
+        self._t_start: Optional[float] = None
+        self._closed = threading.Event()
+        self._event: Optional[Tuple[int, Callable]] = None
+        self._event_thread: Optional[threading.Thread] = None
+        self.in_stream = SimulatedInStream(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def register_every_n_samples_acquired_into_buffer_event(self, sample_interval: int, callback_method: Callable):
+        self._event = (int(sample_interval), callback_method)
+
+    def start(self):
+        self._t_start = time.monotonic()
+        if self._event:
+            self._event_thread = threading.Thread(target=self._fire_events, name="sim-daq-events", daemon=True)
+            self._event_thread.start()
+
+    def close(self):
+        self._closed.set()
+        if self._event_thread and self._event_thread is not threading.current_thread():
+            self._event_thread.join()
+
+    def _fire_events(self):
+        n, callback = self._event
+        k = 1
+        while not self._closed.wait(max(0.0, self._t_start + k * n / self.fs - time.monotonic())):
+            callback(0, 1, n, None)
+            k += 1
+
+    def signal(self, start: int, n: int) -> np.ndarray:
+        """Samples [start, start + n) for every channel, in amps or volts."""
+        psi = np.vstack([src.generate(start, n) for src in self.sources])
+        amps = psi_to_current(psi)
+        return amps if self.measurement == "current" else amps * SHUNT_OHMS
+
+class SimulatedReader:
+    """Stand-in for NidaqmxReader on a SimulatedTask, including overruns of the task buffer."""
+    resync_lost = 0             # overruns skip exactly what DAQOverrun reports
+
+    def __init__(self, in_stream: SimulatedInStream):
+        self.stream = in_stream
+
+    @property
+    def available(self) -> int:
+        return self.stream.avail_samp_per_chan
+
+    def read_many_sample(self, data: np.ndarray, number_of_samples_per_channel: int, timeout: float = 10.0) -> int:
+        st, n = self.stream, number_of_samples_per_channel
+        # same array checks as nidaqmx's AnalogMultiChannelReader
+        expected = (len(st.task.sources), n)
+        if data.shape != expected or data.dtype != np.float64 or not data.flags.c_contiguous:
+            raise ValueError(f"read buffer must be a C-contiguous float64 array of shape {expected}, "
+                             f"got {data.dtype} {data.shape}")
+        size = st.task.buffer_size
+        if st.avail_samp_per_chan > size:
+            lost = st.avail_samp_per_chan - size + int(size * DAQ_OVERRUN_MARGIN)
+            st.read_pos += lost
+            raise DAQOverrun(lost)
+        wait = (n - st.avail_samp_per_chan) / st.task.fs
+        if wait > timeout:
+            raise TimeoutError("simulated DAQ read timed out")
+        if wait > 0:
+            time.sleep(wait)
+        data[:] = st.task.signal(st.read_pos, n)
+        st.read_pos += n
+        return n
+
+# ---------------- DAQ Acquisition ----------------
+class ShmRing:
+    """
+    Single-writer sample ring in multiprocessing.shared_memory, used when the
+    DAQ runs in its own process.
+
+    Layout: int64 header [seq, capacity, n_chan, chunk, backlog, overruns, lost, clock_steps]
+    (the last five are AcqCounters fields), then int64 sample index[capacity],
+    float64 times[capacity] and float64 data[n_chan, capacity]. seq counts every
+    sample ever written; the
+    writer fills the slots first and then publishes by bumping seq. Readers keep
+    their own cursor and only trust the newest capacity/2 samples, which a write
+    in progress (blocks are at most capacity/2) can never touch.
+    """
+    HEADER = 8
+
+    def __init__(self, shm: shared_memory.SharedMemory, readonly: bool = False):
+        self.shm = shm
+        self._hdr = np.ndarray((self.HEADER,), dtype=np.int64, buffer=shm.buf)
+        self.capacity = int(self._hdr[1])
+        self.n_chan = int(self._hdr[2])
+        off = self.HEADER * 8
+        self._i = np.ndarray((self.capacity,), dtype=np.int64, buffer=shm.buf, offset=off)
+        off += self.capacity * 8
+        self._t = np.ndarray((self.capacity,), dtype=np.float64, buffer=shm.buf, offset=off)
+        off += self.capacity * 8
+        self._d = np.ndarray((self.n_chan, self.capacity), dtype=np.float64, buffer=shm.buf, offset=off)
+        if readonly:
+            for a in (self._hdr, self._i, self._t, self._d):
+                a.flags.writeable = False
+
+    @classmethod
+    def create(cls, n_chan: int, capacity: int) -> "ShmRing":
+        size = (cls.HEADER + capacity * (2 + n_chan)) * 8
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        hdr = np.ndarray((cls.HEADER,), dtype=np.int64, buffer=shm.buf)
+        hdr[:] = (0, capacity, n_chan, 0, 0, 0, 0, 0)
+        del hdr
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name: str, readonly: bool = False) -> "ShmRing":
+        return cls(shared_memory.SharedMemory(name=name), readonly=readonly)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self._hdr[0])
+
+    # AcqCounters fields, shared with the acquisition process through the header
+    def _counter(slot: int):
+        return property(lambda self: int(self._hdr[slot]),
+                        lambda self, v: self._hdr.__setitem__(slot, v))
+    chunk = _counter(3)
+    backlog = _counter(4)
+    overruns = _counter(5)
+    lost = _counter(6)
+    clock_steps = _counter(7)
+    del _counter
+
+    def write(self, index0: int, times: np.ndarray, block: np.ndarray):
+        """Append a block starting at sample index0: times (n,), block (n_chan, n). Writer side only."""
+        n = len(times)
+        if n > self.capacity // 2:
+            raise ValueError("block larger than half the ring")
+        seq = int(self._hdr[0])
+        i = seq % self.capacity
+        first = min(n, self.capacity - i)
+        sample_idx = np.arange(index0, index0 + n, dtype=np.int64)
+        self._i[i:i + first] = sample_idx[:first]
+        self._t[i:i + first] = times[:first]
+        self._d[:, i:i + first] = block[:, :first]
+        if n > first:
+            self._i[:n - first] = sample_idx[first:]
+            self._t[:n - first] = times[first:]
+            self._d[:, :n - first] = block[:, first:]
+        self._hdr[0] = seq + n
+
+    def read_since(self, cursor: int) -> Tuple[int, Optional[np.ndarray], Optional[np.ndarray], Optional[np.ndarray]]:
+        """
+        Copy out samples written after cursor.
+        Returns (new_cursor, sample_index, times, block). Samples overwritten before
+        this reader got to them simply don't appear, so they show up as a jump
+        in sample_index like any other gap.
+        """
+        window = self.capacity // 2
+        seq = int(self._hdr[0])
+        cursor = max(cursor, seq - window)
+        if seq <= cursor:
+            return seq, None, None, None
+        slots = np.arange(cursor, seq) % self.capacity
+        sample_idx = self._i[slots]
+        times = self._t[slots]
+        block = self._d[:, slots]
+        # writer may have lapped the start of our window while we copied
+        late = (int(self._hdr[0]) - window) - cursor
+        if late > 0:
+            sample_idx, times, block = sample_idx[late:], times[late:], block[:, late:]
+        return seq, sample_idx, times, block
+
+    def close(self):
+        del self._hdr, self._i, self._t, self._d
+        self.shm.close()
+
+    def unlink(self):
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
 
-                # Warm-up
+@dataclass
+class AcqCounters:
+    """Acquisition-side counters read by DAQSession.status (ShmRing mirrors them in process mode)."""
+    chunk: int = 0          # current read size, samples per channel
+    backlog: int = 0        # unread samples per channel in the driver buffer after the last read
+    overruns: int = 0       # driver buffer overrun events
+    lost: int = 0           # samples per channel skipped by overruns
+    clock_steps: int = 0    # host clock steps the sample clock re-anchored to (SampleClock.steps)
+
+def acquire_blocks(cfg: DAQConfig, chan_list: List[str],
+                   sink: Callable[[int, np.ndarray, np.ndarray], None], stop_flag,
+                   counters) -> None:
+    """
+    Blocking acquisition loop shared by thread and process mode.
+    sink(index0, times, block) gets the sample index of the block's first sample,
+    sample-clock timestamps (n,) and a fresh (n_chan, n) array; after an overrun
+    index0 jumps ahead by the samples lost, which downstream turns into a gap.
+    stop_flag is a threading.Event or multiprocessing.Event.
+    counters is an AcqCounters (or a ShmRing, which has the same fields).
+
+    Reads are sized from cfg.target_latency_ms (see DAQConfig.chunk_plan).
+    read_mode "poll" reads in a loop, draining any backlog in one read and
+    doubling the chunk while it keeps falling behind; "event" registers an
+    every-N-samples-acquired callback that reads exactly what is ready, and this
+    thread just waits for stop_flag.
+    """
+    sr = cfg.sample_rate_hz
+    chunk, max_chunk, buffer_size = cfg.chunk_plan()
+    backend = DAQ_BACKENDS[cfg.backend]()
+    task, reader = backend.open(cfg, chan_list, buffer_size=buffer_size)
+    with task:
+        clock = SampleClock(sr)
+        # nidaqmx wants a C-contiguous float64 array of exactly (channels, samples requested), so each read
+        # gets a reshaped prefix of one preallocated flat buffer (a column slice of a wide array isn't contiguous)
+        n_chan = len(chan_list)
+        flat = np.zeros(n_chan * max_chunk, dtype=np.float64)
+
+        def read_buf(n: int) -> np.ndarray:
+            return flat[:n_chan * n].reshape(n_chan, n)
+
+        counters.chunk = chunk
+
+        overruns = LogSummary("DAQ overruns", "warn")
+        read_errors = LogSummary("DAQ read errors", "error")
+
+        def overrun(e: DAQOverrun):
+            counters.overruns += 1
+            counters.lost += e.lost
+            clock.skip(e.lost)
+            overruns.add(overruns=1, samples_lost=e.lost)
+
+        def emit(data: np.ndarray, n: int):
+            if reader.resync_lost:
+                # the read after an overrun started later than reported: those samples are lost too
+                counters.lost += reader.resync_lost
+                clock.skip(reader.resync_lost)
+                overruns.add(samples_lost=reader.resync_lost)
+            index0 = clock.index
+            behind = counters.backlog = reader.available
+            # copied because the buffer is reused on the next read
+            times = clock.stamp(n, behind=behind)
+            counters.clock_steps = clock.steps
+            sink(index0, times, data[:, :n].copy())
+
+        if cfg.read_mode == "event":
+            def on_samples(task_handle, event_type, number_of_samples, callback_data):
+                # runs on the driver's callback thread; a late callback catches up in one read
                 try:
-                    _ = task.read(number_of_samples_per_channel=DAQ_READ_CHUNK, timeout=10.0)
-                except Exception:
-                    pass
+                    n = min(reader.available, max_chunk)
+                    if n > 0:
+                        data = read_buf(n)
+                        emit(data, reader.read_many_sample(data, number_of_samples_per_channel=n, timeout=0.0))
+                except DAQOverrun as e:
+                    overrun(e)
+                except Exception as e:
+                    read_errors.add(errors=1, detail=str(e))
+                return 0
+
+            task.register_every_n_samples_acquired_into_buffer_event(chunk, on_samples)
+            task.start()
+            while not stop_flag.wait(1.0):
+                overruns.tick()
+                read_errors.tick()
+            overruns.flush()
+            read_errors.flush()
+            return
 
-                t = 0.0
-                dt = 1.0 / sr
+        task.start()
 
-                while self._running.is_set():
-                    # Read a small chunk
-                    try:
-                        data = task.read(number_of_samples_per_channel=DAQ_READ_CHUNK, timeout=2.0)
-                    except Exception as e:
-                        # on read error, yield and continue or break depending on design
-                        log(f"DAQ read error: {e}", "error")
-                        await asyncio.sleep(0.1)
-                        continue
-
-                    # Normalize to channel 0 data
-                    ch0 = None
-                    if isinstance(data, list) and data and isinstance(data[0], list):
-                        ch0 = data[0]
-                    else:
-                        ch0 = data
+        # Warm-up
+        try:
+            reader.read_many_sample(read_buf(chunk), number_of_samples_per_channel=chunk, timeout=10.0)
+        except Exception:
+            pass
 
-                    for v in ch0:
-                        now = time.time()
-                        self.buffers.raw_pressure.append(float(v))
-                        self.buffers.raw_time.append(now)
-                        # simple placeholder filter / derived
-                        self.buffers.filt_pressure.append(float(v))
-                        self.buffers.speed.append(0.0)
+        size = chunk
+        caught_up = 0
+        while not stop_flag.is_set():
+            overruns.tick()
+            read_errors.tick()
+            try:
+                # take the whole backlog if there is one, otherwise wait for one chunk
+                backlog = reader.available
+                want = min(max(size, backlog), max_chunk)
+                data = read_buf(want)
+                emit(data, reader.read_many_sample(data, number_of_samples_per_channel=want,
+                                                   timeout=max(2.0, 2.0 * want / sr)))
+            except DAQOverrun as e:
+                overrun(e)
+                continue
+            except Exception as e:
+                read_errors.add(errors=1, detail=str(e))
+                stop_flag.wait(0.1)
+                continue
 
-                        # enqueue to recorder (best-effort)
-                        try:
-                            # record with wall-clock timestamp and channel name (first channel)
-                            chan_name = chan_list[0]
-                            self._daq_out_q.put_nowait((now, float(v), chan_name))
-                        except asyncio.QueueFull:
-                            # drop if recorder queue is full
-                            pass
-
-                    # yield control
-                    await asyncio.sleep(0)
-        except asyncio.CancelledError:
-            # graceful exit
+            # grow while behind, shrink back toward the target once caught up for a while
+            if backlog > size and size < max_chunk:
+                size = min(size * 2, max_chunk)
+                caught_up = 0
+                counters.chunk = size
+            elif size > chunk and backlog < size // 4:
+                caught_up += 1
+                if caught_up >= DAQ_CHUNK_SHRINK_READS:
+                    size = max(size // 2, chunk)
+                    caught_up = 0
+                    counters.chunk = size
+            else:
+                caught_up = 0
+        overruns.flush()
+        read_errors.flush()
+
+def daq_process_main(shm_name: str, cfg: DAQConfig, chan_list: List[str], stop_flag,
+                     level: str = LOG_LEVEL) -> None:
+    """Entry point of the acquisition child process (mode="process"); level is the parent's log level."""
+    listener = setup_logging(level)
+    ring = ShmRing.attach(shm_name)
+    try:
+        acquire_blocks(cfg, chan_list, ring.write, stop_flag, counters=ring)
+    except Exception as e:
+        log("DAQ process error: %s", "error", e)
+    finally:
+        ring.close()
+        listener.stop()
+
+# ---------------- DAQ Session ----------------
+class DAQSession:
+    """
+    Acquisition never runs on the event loop. In "thread" mode the blocking
+    driver read runs on its own thread and blocks are handed to the loop through
+    a deque (append/popleft are atomic) plus at most one pending
+    call_soon_threadsafe wake-up. In "process" mode a child process writes into
+    a ShmRing and the loop drains it every DAQ_SHM_POLL_S, so JSON encoding and
+    SQLite writes here can't delay hardware reads through the GIL. Either way the
+    loop side appends blocks to the ring buffers and the recorder queue.
+    """
+    def __init__(self, buffers: RingBuffers, out_queue: RecorderQueue):
+        self.cfg = DAQConfig()
+        self.buffers = buffers
+        self._daq_out_q = out_queue
+        self._chan_list: Tuple[str, ...] = ()
+        # thread mode
+        self._thread: Optional[threading.Thread] = None
+        self._stop_flag = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handoff: deque = deque()
+        self._wake_pending = False
+        # process mode
+        self._proc: Optional[multiprocessing.Process] = None
+        self._proc_stop = None
+        self._ring: Optional[ShmRing] = None
+        self._pump_task: Optional[asyncio.Task] = None
+        # throughput / latency counters (loop side), reset on start
+        self._t_started: Optional[float] = None
+        self._samples = 0
+        self._blocks = 0
+        self._lat_sum = 0.0
+        self._lat_max = 0.0
+        self._calibrator = self._build_calibrator(self.cfg)
+        self._counters = AcqCounters()
+        # gap tracking (loop side)
+        self._next_index: Optional[int] = None
+        self._last_time = 0.0
+        self._gaps = 0
+        self._gap_samples = 0
+        self._gap_log = LogSummary("DAQ gaps", "warn")
+        # recorder handoff (loop side): blocks the full recorder queue refused, pending as one gap marker
+        self._rec_last_time: Optional[float] = None
+        self._rec_hole: Optional[DAQGap] = None
+        self._rec_dropped = 0
+        self._rec_drop_log = LogSummary("Recorder queue full, blocks not recorded", "warn")
+
+    def running(self) -> bool:
+        if self._proc is not None:
+            return self._proc.is_alive()
+        return self._thread is not None and self._thread.is_alive()
+
+    def configure(self, **kwargs):
+        if self.running():
+            raise RuntimeError("Stop DAQ before reconfiguring.")
+        # validate a copy so a rejected request leaves the current config untouched
+        cfg = replace(self.cfg, **{k: v for k, v in kwargs.items() if hasattr(self.cfg, k)})
+        if cfg.mode not in ("thread", "process"):
+            raise ValueError(f"unknown DAQ mode {cfg.mode!r}")
+        if cfg.read_mode not in ("poll", "event"):
+            raise ValueError(f"unknown DAQ read_mode {cfg.read_mode!r}")
+        if cfg.backend not in DAQ_BACKENDS:
+            raise ValueError(f"unknown DAQ backend {cfg.backend!r}")
+        if cfg.measurement not in ("voltage", "current"):
+            raise ValueError(f"unknown DAQ measurement {cfg.measurement!r}")
+        if not cfg.target_latency_ms > 0:
+            raise ValueError("target_latency_ms must be > 0")
+        # raises on a bad calibration entry, before anything is committed
+        calibrator = self._build_calibrator(cfg)
+        self.cfg, self._calibrator = cfg, calibrator
+        log(f"DAQ configured: {self.cfg}", "success")
+
+    async def start(self):
+        if self.running():
+            log("DAQ already running.", "warn")
             return
+        if self._proc is not None:
+            # the previous acquisition process died on its own; release its ring before making a new one
+            await self._stop_process()
+        self._loop = asyncio.get_running_loop()
+        backend = DAQ_BACKENDS[self.cfg.backend]()
+        device = self.cfg.device or await self._loop.run_in_executor(None, backend.discover_device)
+        self._chan_list = tuple(f"{device}/{ch}" for ch in self.cfg.channels)
+        sr = self.cfg.sample_rate_hz
+        self.buffers.set_daq_channels(list(self.cfg.channels), sr)
+        self._t_started = time.time()
+        self._samples = self._blocks = 0
+        self._lat_sum = self._lat_max = 0.0
+        self._counters = AcqCounters()
+        self._next_index = None
+        self._gaps = self._gap_samples = 0
+        self._rec_last_time = self._rec_hole = None
+        self._rec_dropped = 0
+
+        if self.cfg.mode == "process":
+            # the ring only trusts half its capacity, so it must hold two of the largest reads
+            capacity = max(int(sr * DAQ_SHM_SECONDS), self.cfg.chunk_plan()[1] * 4)
+            self._ring = ShmRing.create(len(self._chan_list), capacity)
+            ctx = multiprocessing.get_context("spawn")
+            self._proc_stop = ctx.Event()
+            self._proc = ctx.Process(target=daq_process_main, name="daq-acquire", daemon=True,
+                                     args=(self._ring.name, self.cfg, list(self._chan_list), self._proc_stop, log_level()))
+            self._proc.start()
+            self._pump_task = asyncio.create_task(self._pump_ring())
+        else:
+            self._stop_flag.clear()
+            self._thread = threading.Thread(target=self._acquire, name="daq-acquire", daemon=True)
+            self._thread.start()
+        log(f"DAQ started ({self.cfg.mode} mode).", "success")
+
+    async def stop(self):
+        loop = asyncio.get_running_loop()
+        stopped = False
+        self._stop_flag.set()
+        if self._thread:
+            # the reader notices the flag after its current read (<= read timeout)
+            await loop.run_in_executor(None, self._thread.join)
+            self._thread = None
+            self._drain_handoff()
+            stopped = True
+        if self._proc:
+            await self._stop_process()
+            stopped = True
+        if stopped:
+            self._gap_log.flush()
+            self._rec_drop_log.flush()
+            log("DAQ stopped.", "success")
+
+    async def _stop_process(self):
+        """Stop (or reap, if it already died) the acquisition process and release its shared-memory ring."""
+        self._proc_stop.set()
+        await asyncio.get_running_loop().run_in_executor(None, self._proc.join, 5.0)
+        if self._proc.is_alive():
+            log("DAQ process did not exit; terminating.", "warn")
+            self._proc.terminate()
+            await asyncio.get_running_loop().run_in_executor(None, self._proc.join, 5.0)
+        if self._pump_task:
+            # the pump does a last read once it sees the process has exited
+            try:
+                await asyncio.wait_for(self._pump_task, timeout=1.0)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+            self._pump_task = None
+        self._proc = None
+        # the counters only live in the ring header; keep their final values for status() after the stop
+        for f in fields(AcqCounters):
+            setattr(self._counters, f.name, getattr(self._ring, f.name))
+        self._ring.close()
+        self._ring.unlink()
+        self._ring = None
+
+    # ---- acquisition thread ----
+    def _hand_off(self, index0: int, times: np.ndarray, block: np.ndarray):
+        """Called on the acquisition thread; never blocks."""
+        self._handoff.append((index0, times, block))
+        if not self._wake_pending:
+            self._wake_pending = True
+            try:
+                self._loop.call_soon_threadsafe(self._drain_handoff)
+            except RuntimeError:
+                # loop already closed during shutdown
+                pass
+
+    def _acquire(self):
+        try:
+            acquire_blocks(self.cfg, list(self._chan_list), self._hand_off, self._stop_flag,
+                           counters=self._counters)
         except Exception as e:
             log(f"DAQ session error: {e}", "error")
 
+    # ---- event loop side ----
+    def _drain_handoff(self):
+        # clear the flag first so a block appended while draining schedules a new wake-up
+        self._wake_pending = False
+        while self._handoff:
+            self._ingest(*self._handoff.popleft())
+
+    async def _pump_ring(self):
+        reader = ShmRing.attach(self._ring.name, readonly=True)
+        cursor = 0
+        try:
+            while True:
+                await asyncio.sleep(DAQ_SHM_POLL_S)
+                cursor, idx, times, block = reader.read_since(cursor)
+                if times is not None and len(times):
+                    # one read may span several blocks, a gap and a re-anchored clock (see _ingest);
+                    # ingest each run that is contiguous in both sample index and time
+                    dt = np.diff(times)
+                    cuts = np.flatnonzero((np.diff(idx) != 1) |
+                                          (np.abs(dt - 1.0 / self.cfg.sample_rate_hz) > DAQ_CLOCK_STEP_S / 2)) + 1
+                    for a, b in zip(np.r_[0, cuts], np.r_[cuts, len(idx)]):
+                        self._ingest(int(idx[a]), times[a:b], block[:, a:b])
+                if not self._proc.is_alive():
+                    log("DAQ process exited.", "warn")
+                    break
+        finally:
+            reader.close()
+
+    @staticmethod
+    def _build_calibrator(cfg: DAQConfig) -> BlockCalibrator:
+        try:
+            cals = [ChannelCalibration.for_measurement(cfg.measurement, **cfg.calibration.get(ch, {}))
+                    for ch in cfg.channels]
+        except TypeError as e:
+            # unknown calibration field
+            raise ValueError(f"bad DAQ calibration: {e}") from e
+        return BlockCalibrator(cals)
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = time.time() - self._t_started if self._t_started else 0.0
+        acq = self._ring if self._ring is not None else self._counters
+        return {
+            "running": self.running(),
+            "backend": self.cfg.backend,
+            "mode": self.cfg.mode,
+            "read_mode": self.cfg.read_mode,
+            "channels": list(self._chan_list),
+            "sample_rate_hz": self.cfg.sample_rate_hz,
+            "target_latency_ms": self.cfg.target_latency_ms,
+            "read_chunk": acq.chunk,
+            # unread samples in the driver buffer; one task, so the same for every channel
+            "backlog": {ch: acq.backlog for ch in self.cfg.channels},
+            "overruns": acq.overruns,
+            "overrun_samples_lost": acq.lost,
+            "clock_steps": acq.clock_steps,
+            "gaps": self._gaps,
+            "gap_samples": self._gap_samples,
+            "recorder_dropped_samples": self._rec_dropped,
+            "samples": self._samples,
+            "blocks": self._blocks,
+            "rate_hz": self._samples / elapsed if elapsed > 0 else 0.0,
+            # sample-clock time of a block's newest sample -> ingested on the loop
+            "latency_ms_avg": 1000.0 * self._lat_sum / self._blocks if self._blocks else 0.0,
+            "latency_ms_max": 1000.0 * self._lat_max,
+            "open_loop": dict(zip(self.cfg.channels, self._calibrator.open_loop.tolist())),
+        }
+
+    def _mark_gap(self, index0: int, t_next: float):
+        gap = DAQGap(self._last_time, t_next, self._next_index, index0 - self._next_index)
+        self._gaps += 1
+        self._gap_samples += gap.missing
+        self._gap_log.add(gaps=1, samples_missing=gap.missing)
+        self.buffers.daq_gaps.append(gap)
+        self._daq_out_q.offer(gap)
+
+    def _mark_clock_step(self, index0: int, t_next: float):
+        """The sample clock re-anchored to a stepped host clock: a zero-sample gap marks the time axis jump."""
+        step = t_next - self._last_time
+        log("DAQ timestamps jumped %+.3f s (host clock step); re-anchored.", "warn", step)
+        if step < 0:
+            # the time rings must stay ascending for searches and alignment: restart them at the current seq.
+            # That drops the held DAQ history, but not the gap markers (overruns stay visible).
+            gaps = list(self.buffers.daq_gaps)
+            self.buffers.set_daq_channels(list(self.cfg.channels), self.cfg.sample_rate_hz)
+            self.buffers.daq_gaps.extend(gaps)
+        gap = DAQGap(self._last_time, t_next, index0, 0)
+        self._gaps += 1
+        self.buffers.daq_gaps.append(gap)
+        self._daq_out_q.offer(gap)
+
+    def _record(self, index0: int, times: np.ndarray, block: np.ndarray):
+        """Hand a whole block to the recorder; a block the full queue refuses becomes part of a daq_gaps marker."""
+        q = self._daq_out_q
+        if not q.accepting:
+            self._rec_hole = None
+            return
+        # record with sample-clock timestamps and full physical channel names
+        item = (times, block, self._chan_list)
+        hole = self._rec_hole
+        if q.offer(item) if hole is None else q.offer(hole._replace(t_end=float(times[0])), item):
+            self._rec_hole = None
+            self._rec_last_time = float(times[-1])
+            return
+        if hole is None:
+            t_last = self._rec_last_time if self._rec_last_time is not None else float(times[0])
+            hole = DAQGap(t_last, float(times[0]), index0, 0)
+        self._rec_hole = hole._replace(missing=hole.missing + len(times))
+        self._rec_dropped += len(times)
+        self._rec_drop_log.add(blocks=1, samples=len(times))
+
+    def _ingest(self, index0: int, times: np.ndarray, block: np.ndarray):
+        self._gap_log.tick()
+        self._rec_drop_log.tick()
+        if self._next_index is not None and index0 > self._next_index:
+            self._mark_gap(index0, float(times[0]))
+        elif self._next_index is not None and \
+                abs(float(times[0]) - self._last_time - 1.0 / self.cfg.sample_rate_hz) > DAQ_CLOCK_STEP_S / 2:
+            self._mark_clock_step(index0, float(times[0]))
+        self._next_index = index0 + len(times)
+        self._last_time = float(times[-1])
+
+        lat = time.time() - float(times[-1])
+        self._samples += len(times)
+        self._blocks += 1
+        self._lat_sum += lat
+        self._lat_max = max(self._lat_max, lat)
+
+        # raw A/V -> engineering units before anything downstream sees the block
+        block = self._calibrator.apply(block)
+        self.buffers.extend_daq(times, block)
+
+        self._record(index0, times, block)
+
 # ---------------- RIG Session ----------------
 @dataclass
 class RigConfig:
@@ -451,7 +2189,7 @@ class RigConfig:
     baudrate: int = 57600
 
 class RigSession:
-    def __init__(self, buffers: RingBuffers, out_queue: "asyncio.Queue[Tuple]"):
+    def __init__(self, buffers: RingBuffers, out_queue: RecorderQueue):
         self.cfg = RigConfig()
         self.buffers = buffers
         self._task: Optional[asyncio.Task] = None
@@ -467,6 +2205,8 @@ class RigSession:
         log(f"RIG configured: {self.cfg}", "success")
 
     async def start(self):
+        if serial_asyncio is None:
+            raise RuntimeError("pyserial-asyncio is not installed.")
         if not self.cfg.port:
             raise RuntimeError("RIG port not set. Call configure_rig first.")
         if self._task and not self._task.done():
@@ -551,6 +2291,15 @@ class RigSession:
                     continue
 
                 now = time.time()
+                last = self.buffers.rig_time.tail(1)
+                if len(last) and now < last[0]:
+                    # host clock stepped back: rig_time must stay ascending for searches and alignment
+                    if last[0] - now > DAQ_CLOCK_STEP_S:
+                        log("RIG timestamps jumped %+.3f s (host clock step); rig history restarted.", "warn",
+                            now - last[0])
+                        self.buffers.restart_rig()
+                    else:
+                        now = float(last[0])
                 ctP, whP, ctD, ctW, ctS, ctFR, n2FR = values
 
                 # append to ring buffers
@@ -563,11 +2312,8 @@ class RigSession:
                 self.buffers.n2FluidRate.append(n2FR)
                 self.buffers.rig_time.append(now)
 
-                # enqueue to recorder (non-blocking)
-                try:
-                    self._rig_out_q.put_nowait((now, ctP, whP, ctD, ctW, ctS, ctFR, n2FR))
-                except asyncio.QueueFull:
-                    pass
+                # enqueue to recorder (non-blocking; refusals are counted in the queue)
+                self._rig_out_q.offer((now, ctP, whP, ctD, ctW, ctS, ctFR, n2FR))
         finally:
             try:
                 writer.close()
@@ -575,46 +2321,529 @@ class RigSession:
             except Exception:
                 pass
 
+# ---------------- Subscriptions ----------------
+DECIMATION_MODES = ("mean", "last", "minmax")
+
+@dataclass(frozen=True)
+class Subscription:
+    """
+    What one client wants from the stream. Equal subscriptions are rendered once per tick.
+      streams  series names (DAQ channel names, "rawPressure" = first channel, derived and rig
+               names); None = everything
+      rate_hz  target points per second per series; None = every sample
+      mode     how a bucket of samples becomes points: "mean", "last", or "minmax" (two points
+               per bucket, the bucket's extremes in the order they occurred, so dips survive)
+      aligned  instead of per-source frames, send every series on one common clock at rate_hz
+               (see align); mode doesn't apply
+    """
+    streams: Optional[Tuple[str, ...]] = None
+    rate_hz: Optional[float] = None
+    mode: str = "last"
+    aligned: bool = False
+
+    @classmethod
+    def from_msg(cls, msg: Dict[str, Any]) -> "Subscription":
+        streams = msg.get("streams")
+        rate = msg.get("rate_hz")
+        mode = msg.get("mode", "last")
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f"mode must be one of {DECIMATION_MODES}")
+        if streams is not None and (not isinstance(streams, (list, tuple))
+                                    or not all(isinstance(n, str) for n in streams)):
+            raise ValueError("streams must be a list of series names")
+        if rate is not None and float(rate) <= 0:
+            raise ValueError("rate_hz must be > 0")
+        aligned = bool(msg.get("aligned", False))
+        if aligned and rate is None:
+            raise ValueError("aligned subscriptions need rate_hz")
+        return cls(streams=tuple(sorted(set(streams))) if streams is not None else None,
+                   rate_hz=float(rate) if rate is not None else None, mode=mode, aligned=aligned)
+
+    def step(self, source_rate_hz: float) -> int:
+        """Samples per bucket for a series sampled at source_rate_hz (1 = no decimation)."""
+        if self.rate_hz is None:
+            return 1
+        points = self.rate_hz / 2 if self.mode == "minmax" else self.rate_hz
+        return max(1, int(round(source_rate_hz / points)))
+
+    def resolve(self, buffers: RingBuffers) -> Optional[Set[str]]:
+        if self.streams is None:
+            return None
+        names = set(self.streams)
+        if "rawPressure" in names and buffers.raw:
+            names.add(next(iter(buffers.raw)))
+        return names
+
+DEFAULT_SUBSCRIPTION = Subscription()
+
+def decimate(times: np.ndarray, series: Dict[str, np.ndarray], step: int,
+             mode: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Reduce whole buckets of `step` samples (len(times) must be a multiple of step)."""
+    if step == 1 or not len(times):
+        return times, series
+    m = len(times) // step
+    tb = times.reshape(m, step)
+    if mode == "last":
+        return tb[:, -1], {k: v.reshape(m, step)[:, -1] for k, v in series.items()}
+    if mode == "mean":
+        return tb.mean(axis=1), {k: v.reshape(m, step).mean(axis=1) for k, v in series.items()}
+    # minmax: two points per bucket at the bucket's first/last time, extremes in occurrence order
+    rows = np.arange(m)
+    out_t = np.empty(2 * m)
+    out_t[0::2], out_t[1::2] = tb[:, 0], tb[:, -1]
+    out: Dict[str, np.ndarray] = {}
+    for k, v in series.items():
+        vb = v.reshape(m, step)
+        imin, imax = vb.argmin(axis=1), vb.argmax(axis=1)
+        o = np.empty(2 * m)
+        o[0::2] = vb[rows, np.minimum(imin, imax)]
+        o[1::2] = vb[rows, np.maximum(imin, imax)]
+        out[k] = o
+    return out_t, out
+
+def render_window(buffers: RingBuffers, sub: Subscription, daq: Tuple[int, int], rig: Tuple[int, int],
+                  daq_step: int, rig_step: int) -> Dict[str, np.ndarray]:
+    """window_arrays for one subscription, decimated per group."""
+    arrays = buffers.window_arrays(daq, rig, sub.resolve(buffers))
+    out: Dict[str, np.ndarray] = {}
+    for time_name, step, rings in (("rawTime", daq_step, buffers.daq_rings()),
+                                   ("rigTime", rig_step, buffers.rig_rings())):
+        if time_name not in arrays:
+            continue
+        names = [k for k in rings if k in arrays]
+        env = None
+        if time_name == "rawTime" and sub.mode == "minmax" and step > 1:
+            # raw channels come from the streaming envelope: O(points), not O(samples)
+            env = buffers.envelope_window(daq, step, [k for k in names if k in buffers.raw])
+        if env is not None:
+            t, series = env
+            rest = [k for k in names if k not in series]
+            if rest:
+                series.update(decimate(arrays[time_name], {k: arrays[k] for k in rest}, step, sub.mode)[1])
+        else:
+            t, series = decimate(arrays[time_name], {k: arrays[k] for k in names}, step, sub.mode)
+        out[time_name] = t
+        out.update(series)
+    return out
+
+
+# ---------------- Stream Frames ----------------
+# Binary stream frame (little-endian), opt-in per client with {"cmd":"set_stream_format"}:
+#   header  "<4sBBHQdQQQQ": magic b"TDAF", version, dtype (0 = float32, 1 = float64), n_streams, seq, t0,
+#           daq_seq, daq_end, rig_seq, rig_end (raw sample seqs [first, end) this frame covers; with
+#           decimation fewer points than end - first are sent; aligned frames carry their grid index
+#           range [k0, k1) in both pairs)
+#   table   n_streams x "<HHI": stream id, flags, count
+#   arrays  one per table entry, in table order, each zero-padded to an 8-byte boundary
+# Every array starts 8-byte aligned so clients can view it in place (Float32List/Float64List views,
+# np.frombuffer). Stream ids map to names via the {"type":"stream_ids"} message / set_stream_format
+# reply. Values are sent as-is (open-loop samples stay NaN).
+# With "compress":"zlib" every stream payload (JSON stream/aligned messages, binary and history frames)
+# arrives as a binary message holding the zlib stream of that payload; control replies stay plain JSON text.
+# Such clients should connect without offering permessage-deflate (e.g. websockets' compression=None),
+# or their already-compressed frames are deflated again per connection.
+FRAME_MAGIC = b"TDAF"
+FRAME_VERSION = 3
+FRAME_HEADER = struct.Struct("<4sBBHQdQQQQ")
+FRAME_ENTRY = struct.Struct("<HHI")
+FRAME_DTYPES = {"f32": (0, np.dtype("<f4")), "f64": (1, np.dtype("<f8"))}
+FRAME_FLAG_TIME = 1           # timestamps, relative to the header's t0
+FRAME_FLAG_GAPS = 2           # flattened [t_start - t0, t_end - t0, missing] triples
+TIME_STREAMS = ("rawTime", "rigTime", "alignedTime")
+
+class StreamIds:
+    """Stable stream name -> id map; ids are assigned on first use and never reused."""
+    def __init__(self):
+        self.ids: Dict[str, int] = {"gaps": 0}
+
+    def assign(self, names) -> bool:
+        """Give ids to unseen names; True if the map grew (clients need a fresh stream_ids)."""
+        grew = False
+        for name in names:
+            if name not in self.ids:
+                self.ids[name] = len(self.ids)
+                grew = True
+        return grew
+
+def encode_frame(seq: int, daq: Tuple[int, int], rig: Tuple[int, int], arrays: Dict[str, np.ndarray],
+                 gaps: List[DAQGap], ids: StreamIds, dtype: str = "f32") -> bytes:
+    """Pack one window (see window_arrays) into a binary stream frame."""
+    code, dt = FRAME_DTYPES[dtype]
+    firsts = [arrays[k][0] for k in TIME_STREAMS if k in arrays and len(arrays[k])]
+    t0 = float(min(firsts)) if firsts else 0.0
+    entries: List[Tuple[int, int, np.ndarray]] = []
+    for name, a in arrays.items():
+        if name in TIME_STREAMS:
+            entries.append((ids.ids[name], FRAME_FLAG_TIME, a - t0))
+        else:
+            entries.append((ids.ids[name], 0, a))
+    if gaps:
+        g = np.array([(x.t_start - t0, x.t_end - t0, x.missing) for x in gaps], dtype=np.float64)
+        entries.append((ids.ids["gaps"], FRAME_FLAG_GAPS, g.ravel()))
+
+    parts = [FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, code, len(entries), seq, t0, *daq, *rig)]
+    parts += [FRAME_ENTRY.pack(sid, flags, len(a)) for sid, flags, a in entries]
+    for _, _, a in entries:
+        body = a.astype(dt, copy=False).tobytes()
+        parts.append(body)
+        if len(body) % 8:
+            parts.append(bytes(8 - len(body) % 8))
+    return b"".join(parts)
+
+class DecodedFrame(NamedTuple):
+    seq: int
+    t0: float
+    daq_seq: int
+    daq_end: int
+    rig_seq: int
+    rig_end: int
+    streams: Dict[int, Tuple[int, np.ndarray]]     # stream id -> (flags, array view into the frame)
+
+def decode_frame(frame: bytes) -> DecodedFrame:
+    """Reference decoder; the arrays alias `frame` (no copies)."""
+    magic, version, code, n, seq, t0, daq_seq, daq_end, rig_seq, rig_end = FRAME_HEADER.unpack_from(frame, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError("not a stream frame")
+    dt = FRAME_DTYPES["f32" if code == 0 else "f64"][1]
+    off = FRAME_HEADER.size + n * FRAME_ENTRY.size
+    out: Dict[int, Tuple[int, np.ndarray]] = {}
+    for i in range(n):
+        sid, flags, count = FRAME_ENTRY.unpack_from(frame, FRAME_HEADER.size + i * FRAME_ENTRY.size)
+        out[sid] = (flags, np.frombuffer(frame, dtype=dt, count=count, offset=off))
+        off += -(-count * dt.itemsize // 8) * 8
+    return DecodedFrame(seq, t0, daq_seq, daq_end, rig_seq, rig_end, out)
+
+
 # ---------------- Hub & Broadcaster ----------------
+class ClientConn:
+    """
+    One websocket client: its stream settings and a writer task fed by a bounded queue, so a slow
+    or stalled client never holds up the broadcaster or the other clients. Stream frames beyond
+    WS_MAX_QUEUE drop the oldest queued frame (the client sees a seq jump); control messages
+    (stream_ids) are never dropped and go out before queued frames.
+    """
+    def __init__(self, ws, hub: "Hub"):
+        self.ws = ws
+        self.hub = hub
+        self.format = "json"                     # "json" | "f32" | "f64"
+        self.compress = False                    # stream payloads zlib-compressed (once, in hub.cache)
+        self.sub = DEFAULT_SUBSCRIPTION
+        self.cursor: Optional[Tuple[int, int]] = None   # next (DAQ seq, rig seq) to send
+        self.grid_cursor: Optional[int] = None           # next grid index, aligned subscriptions
+        self._frames: deque = deque()
+        self._control: deque = deque()
+        self._wake = asyncio.Event()
+        self.sent = self.dropped = 0
+        self._lagging_since: Optional[float] = None
+        self.task = asyncio.create_task(self._writer())
+        self.closing: Optional[asyncio.Task] = None      # lag disconnect in progress (kept so it isn't collected)
+
+    def enqueue(self, payload, control: bool = False) -> None:
+        if control:
+            self._control.append(payload)
+        else:
+            if len(self._frames) >= WS_MAX_QUEUE:
+                self._frames.popleft()
+                self.dropped += 1
+                now = time.monotonic()
+                if self._lagging_since is None:
+                    self._lagging_since = now
+                elif now - self._lagging_since > WS_LAG_DISCONNECT_S and self.closing is None:
+                    log("Client too far behind (%d frames dropped), disconnecting.", "warn", self.dropped)
+                    self.task.cancel()
+                    self.closing = asyncio.create_task(self._disconnect())
+            self._frames.append(payload)
+        self._wake.set()
+
+    async def _writer(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            while self._control or self._frames:
+                payload = self._control.popleft() if self._control else self._frames.popleft()
+                try:
+                    await self.ws.send(payload)
+                except Exception:
+                    await self.hub.unregister(self.ws)
+                    return
+                self.sent += 1
+            self._lagging_since = None
+
+    def restart(self, cursor: Tuple[int, int]) -> None:
+        """Continue the live stream from `cursor`; queued frames from before it are superseded."""
+        self._frames.clear()
+        self.cursor = cursor
+
+    async def _disconnect(self):
+        # the writer may be stuck in a send that will never drain; don't wait on it for long
+        try:
+            await asyncio.wait_for(self.ws.close(1013, "too far behind"), 1.0)
+        except Exception:
+            self.ws.transport.abort()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"format": self.format, "queued": len(self._frames), "sent": self.sent, "dropped": self.dropped}
+
+
+class TickClock:
+    """
+    Fixed-rate ticks on absolute monotonic deadlines (t0 + k*period), so time spent inside a tick
+    doesn't stretch the period. When a tick runs past the next deadline (an overrun) the missed
+    deadlines are skipped, not burst through. Tracks wake-up jitter (lateness vs. the deadline).
+    """
+    JITTER_EWMA = 0.05
+
+    def __init__(self, hz: float):
+        self.period = 1.0 / hz
+        self._deadline: Optional[float] = None
+        self.ticks = self.overruns = self.missed = 0
+        self.jitter_avg = self.jitter_max = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self._deadline is None:
+            self._deadline = now
+        self._deadline += self.period
+        if now > self._deadline:
+            late = int((now - self._deadline) // self.period) + 1
+            self.overruns += 1
+            self.missed += late
+            self._deadline += late * self.period
+        await asyncio.sleep(self._deadline - now)
+        jitter = loop.time() - self._deadline
+        self.ticks += 1
+        self.jitter_avg += self.JITTER_EWMA * (jitter - self.jitter_avg)
+        self.jitter_max = max(self.jitter_max, jitter)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hz": 1.0 / self.period, "ticks": self.ticks, "overruns": self.overruns, "missed": self.missed,
+                "jitter_ms_avg": self.jitter_avg * 1e3, "jitter_ms_max": self.jitter_max * 1e3}
+
+
+def compress_payload(payload) -> bytes:
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    return zlib.compress(payload, WS_ZLIB_LEVEL)
+
+class PayloadCache:
+    """
+    Encode-once cache for one broadcast tick: rendered windows keyed by (subscription, DAQ seq range,
+    rig seq range) and encoded payloads keyed by (subscription, format, DAQ seq range, rig seq range),
+    so each distinct frame is rendered and serialized once however many clients receive it.
+    """
+    def __init__(self):
+        self._windows: Dict[Tuple, Dict[str, np.ndarray]] = {}
+        self._payloads: Dict[Tuple, Any] = {}
+        self.encodes = self.hits = 0
+
+    def clear(self):
+        self._windows.clear()
+        self._payloads.clear()
+
+    def window(self, key: Tuple, render: Callable[[], Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        w = self._windows.get(key)
+        if w is None:
+            w = self._windows[key] = render()
+        return w
+
+    def payload(self, key: Tuple, encode: Callable[[], Any], compress: bool = False) -> Any:
+        if compress:
+            # compressed from the shared uncompressed payload, once per tick for all zlib clients
+            return self.payload(key + ("zlib",), lambda: compress_payload(self.payload(key, encode)))
+        p = self._payloads.get(key)
+        if p is None:
+            p = self._payloads[key] = encode()
+            self.encodes += 1
+        else:
+            self.hits += 1
+        return p
+
+
 class Hub:
     def __init__(self):
-        self.clients: Set[websockets.WebSocketServerProtocol] = set()
+        self.clients: Dict[Any, ClientConn] = {}
+        self.stream_ids = StreamIds()
+        self.cache = PayloadCache()
+        self.clock = TickClock(BROADCAST_HZ)
+        self.seq = 0                             # stream broadcast counter
+        self.last_counts: Optional[Tuple[int, int]] = None   # (DAQ, rig) ring counts at the last broadcast
+        self.skipped_ticks = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"frames": self.seq, "skipped_ticks": self.skipped_ticks,
+                "encodes": self.cache.encodes, "cache_hits": self.cache.hits, "clock": self.clock.stats()}
 
     async def register(self, ws):
-        self.clients.add(ws)
+        self.clients[ws] = ClientConn(ws, self)
 
     async def unregister(self, ws):
-        self.clients.discard(ws)
-
-    async def broadcast(self, msg: Dict[str, Any]):
-        if not self.clients:
-            return
-        payload = safe_json(msg)
-        send_tasks = []
-        for ws in list(self.clients):
-            try:
-                send_tasks.append(asyncio.create_task(ws.send(payload)))
-            except Exception:
-                await self.unregister(ws)
-        if send_tasks:
-            await asyncio.gather(*send_tasks, return_exceptions=True)
+        conn = self.clients.pop(ws, None)
+        if conn is not None and conn.task is not asyncio.current_task():
+            conn.task.cancel()
+
+    def set_format(self, ws, fmt: str, dtype: str = "f32", compress: Optional[str] = None) -> str:
+        conn = self.clients[ws]
+        if compress not in (None, "zlib"):
+            raise ValueError("compress must be 'zlib' or null")
+        if fmt == "json":
+            conn.format = "json"
+        elif fmt == "binary":
+            if dtype not in FRAME_DTYPES:
+                raise ValueError(f"dtype must be one of {sorted(FRAME_DTYPES)}")
+            conn.format = dtype
+        else:
+            raise ValueError("format must be 'json' or 'binary'")
+        conn.compress = compress == "zlib"
+        return conn.format
+
+    def send_history(self, ws, buffers: RingBuffers, msg: Dict[str, Any]) -> None:
+        """
+        Backfill the last `seconds` for one client as a single binary frame (the stream frame layout,
+        any client format), decimated per the client's subscription or the message's own streams /
+        rate_hz / mode. The frame holds at most HISTORY_MAX_BYTES of samples, split evenly across its
+        series: decimation is coarsened to fit, and without any rate_hz the history is a minmax
+        envelope at that budget. The JSON reply and the frame are queued ahead of live data, and the live
+        stream resumes from the frame's end seqs.
+        """
+        conn = self.clients[ws]
+        seconds = float(msg.get("seconds", DAQ_RING_SECONDS))
+        if not seconds > 0:
+            raise ValueError("seconds must be > 0")
+        dtype = msg.get("dtype", "f32")
+        if dtype not in FRAME_DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(FRAME_DTYPES)}")
+        req = {"streams": conn.sub.streams, "rate_hz": conn.sub.rate_hz, "mode": conn.sub.mode,
+               **{k: msg[k] for k in ("streams", "rate_hz", "mode") if k in msg}}
+        if req["rate_hz"] is None and "mode" not in msg:
+            req["mode"] = "minmax"
+        sub = Subscription.from_msg(req)
+        # points per series the byte budget allows, over the series that have data (time series included)
+        wanted = sub.resolve(buffers)
+        arrays_sent = 0
+        for time_ring, rings in ((buffers.raw_time, buffers.daq_rings()), (buffers.rig_time, buffers.rig_rings())):
+            n = sum(1 for name in rings if wanted is None or name in wanted) if len(time_ring) else 0
+            arrays_sent += n + 1 if n else 0
+        points = max(2, HISTORY_MAX_BYTES // FRAME_DTYPES[dtype][1].itemsize // max(1, arrays_sent))
+        per_bucket = 2 if sub.mode == "minmax" else 1
+
+        def fit(time_ring: ArrayRing, step: int, buckets: Tuple[int, ...] = ()) -> int:
+            # coarsen until the span fits the budget; DAQ steps stay on an envelope bucket multiple
+            n = time_ring.count - buffers.seq_for_last(time_ring, seconds)
+            step = max(step, -(-n * per_bucket // points))
+            fits = [b for b in buckets if b <= step]
+            return -(-step // fits[0]) * fits[0] if fits and sub.mode == "minmax" else step
+        daq_step = fit(buffers.raw_time, buffers.daq_step(sub), tuple(env.bucket for env in buffers.envelopes))
+        rig_step = fit(buffers.rig_time, buffers.rig_step(sub))
+
+        def span(time_ring: ArrayRing, step: int, live_step: int) -> Tuple[int, int]:
+            limit = max(step, points // per_bucket * step)
+            first, _ = buffers.seq_range(time_ring, buffers.seq_for_last(time_ring, seconds), limit, step)
+            # end on a bucket boundary of both the history and the live stream so live resumes exactly there
+            grid = math.lcm(step, live_step)
+            return first, max(first, time_ring.count // grid * grid)
+        daq = span(buffers.raw_time, daq_step, buffers.daq_step(conn.sub))
+        rig = span(buffers.rig_time, rig_step, buffers.rig_step(conn.sub))
+        arrays = render_window(buffers, sub, daq, rig, daq_step, rig_step)
+        raw_time = arrays.get("rawTime", ())
+        gaps = buffers.gaps_since(raw_time[0]) if len(raw_time) else []
+        self.announce_ids(arrays)
+        frame = encode_frame(self.seq, daq, rig, arrays, gaps, self.stream_ids, dtype)
+        if conn.compress:
+            frame = compress_payload(frame)
+        conn.restart((daq[1], rig[1]))
+        # the span actually returned, which is shorter than asked for when the rings don't reach back that far
+        t = raw_time if len(raw_time) else arrays.get("rigTime", ())
+        conn.enqueue(safe_json({"ok": True, "history": {
+            "seconds": float(t[-1] - t[0]) if len(t) else 0.0, "requestedSeconds": seconds, "daqSeq": daq[0], "daqEnd": daq[1], "rigSeq": rig[0], "rigEnd": rig[1],
+            "bytes": len(frame), "stream_ids": self.stream_ids.ids}}), control=True)
+        conn.enqueue(frame, control=True)
+
+    def announce_ids(self, names) -> None:
+        """Assign stream ids to unseen names and tell binary clients ahead of frames that use them."""
+        if self.stream_ids.assign(names):
+            binary = [c for c in self.clients.values() if c.format != "json"]
+            self.send(binary, safe_json({"type": "stream_ids", "ids": self.stream_ids.ids}), control=True)
+
+    def send(self, targets: List[ClientConn], payload, control: bool = False) -> None:
+        """Queue one already-encoded payload on several clients; never waits on the network."""
+        for conn in targets:
+            conn.enqueue(payload, control)
+
+def encode_stream(hub: Hub, buffers: RingBuffers, sub: Subscription, fmt: str,
+                  daq: Tuple[int, int], rig: Tuple[int, int]):
+    """Render (once per tick, via hub.cache) and encode one stream frame."""
+    daq_step, rig_step = buffers.daq_step(sub), buffers.rig_step(sub)
+    arrays = hub.cache.window((sub, daq, rig), lambda: render_window(buffers, sub, daq, rig, daq_step, rig_step))
+    if fmt == "json":
+        data = buffers.stream_json(arrays)
+        log("stream: %s", "data", data)
+        return safe_json({"type": "stream", "seq": hub.seq, "daqSeq": daq[0], "daqEnd": daq[1],
+                          "rigSeq": rig[0], "rigEnd": rig[1], "data": data})
+    raw_time = arrays.get("rawTime", ())
+    gaps = buffers.gaps_since(raw_time[0]) if len(raw_time) else []
+    hub.announce_ids(arrays)
+    return encode_frame(hub.seq, daq, rig, arrays, gaps, hub.stream_ids, fmt)
+
+def encode_aligned(hub: Hub, buffers: RingBuffers, sub: Subscription, fmt: str, grid: Tuple[int, int]):
+    """Encode one aligned frame: grid indices [k0, k1) at sub.rate_hz, every subscribed series on that clock."""
+    times = np.arange(*grid) / sub.rate_hz
+    series = align(buffers, times, sub.resolve(buffers))
+    if fmt == "json":
+        return safe_json({"type": "aligned", "seq": hub.seq, "gridSeq": grid[0], "gridEnd": grid[1],
+                          "rateHz": sub.rate_hz,
+                          "data": {"time": times.tolist(), **{k: json_floats(v) for k, v in series.items()}}})
+    arrays = {"alignedTime": times, **series}
+    hub.announce_ids(arrays)
+    return encode_frame(hub.seq, grid, grid, arrays, [], hub.stream_ids, fmt)
 
 async def broadcaster(hub: Hub, buffers: RingBuffers):
-    period = 1.0 / BROADCAST_HZ
+    """
+    Incremental stream: each client gets only the samples after the last seq it was sent
+    (a new client starts with the newest SNAP_TAIL points), filtered and decimated per its
+    Subscription. Each distinct (subscription, format, seq range) is encoded once per tick
+    (hub.cache); a tick where no ring has new data is skipped outright. Ticks run on hub.clock's
+    absolute deadlines.
+    """
     SNAP_TAIL = 50
+    summary = LogSummary("broadcast")
     while True:
-        await asyncio.sleep(period)
+        await hub.clock.wait()
         if not hub.clients:
             continue
-        tail = buffers.snapshot_tail(n=SNAP_TAIL)
-        log(f"stream: {tail}", "data")
-        await hub.broadcast({"type": "stream", "data": tail})
+        counts = (buffers.raw_time.count, buffers.rig_time.count)
+        if counts == hub.last_counts and all(c.cursor is not None for c in hub.clients.values()):
+            hub.skipped_ticks += 1
+            continue
+        hub.last_counts = counts
+        hub.seq += 1
+        hub.cache.clear()
+        encodes0, sent = hub.cache.encodes, 0
+        daq_end, rig_end = counts
+        for conn in list(hub.clients.values()):
+            sub, fmt = conn.sub, conn.format
+            if sub.aligned:
+                grid = grid_range(sub.rate_hz, conn.grid_cursor, SNAP_TAIL)
+                conn.grid_cursor = grid[1]
+                if grid[0] < grid[1]:
+                    conn.enqueue(hub.cache.payload((sub, fmt, grid),
+                                                   lambda: encode_aligned(hub, buffers, sub, fmt, grid), conn.compress))
+                    sent += 1
+                continue
+            daq_step, rig_step = buffers.daq_step(sub), buffers.rig_step(sub)
+            daq_next, rig_next = conn.cursor or (daq_end - SNAP_TAIL * daq_step, rig_end - SNAP_TAIL * rig_step)
+            daq = buffers.seq_range(buffers.raw_time, daq_next, STREAM_MAX_SAMPLES, daq_step)
+            rig = buffers.seq_range(buffers.rig_time, rig_next, STREAM_MAX_SAMPLES, rig_step)
+            conn.cursor = (daq[1], rig[1])
+            if daq[0] == daq[1] and rig[0] == rig[1]:
+                continue
+            conn.enqueue(hub.cache.payload((sub, fmt, daq, rig),
+                                           lambda: encode_stream(hub, buffers, sub, fmt, daq, rig), conn.compress))
+            sent += 1
+        summary.add(ticks=1, frames_sent=sent, encodes=hub.cache.encodes - encodes0)
 
 def verbose_log(data):
-    log("======================", "info")
-    log(f"[WS RX] Raw JSON: {data}", "data")   # raw string
-    log(f"[WS RX] Parsed dict: {json.dumps(data, indent=2)}", "log")  # pretty print parsed dict
-    log("======================", "info")
+    log("[WS RX] %s", "debug", data)
 
 
 # ---------------- Websocket Handler ----------------
@@ -625,8 +2854,7 @@ async def ws_handler(ws, path, daq: DAQSession, rig: RigSession, hub: Hub, recor
         async for raw in ws:
             try:
                 msg = json.loads(raw)
-                if VERBOSE:
-                    verbose_log(msg)
+                verbose_log(msg)
             except Exception:
                 await ws.send(safe_json({"ok": False, "error": "invalid_json"}))
                 continue
@@ -676,6 +2904,28 @@ async def ws_handler(ws, path, daq: DAQSession, rig: RigSession, hub: Hub, recor
                     await recorder.stop()
                     await ws.send(safe_json({"ok": True, "recording": False}))
 
+                # Stream format
+                elif cmd == "set_stream_format":
+                    fmt = hub.set_format(ws, msg.get("format", "json"), msg.get("dtype", "f32"), msg.get("compress"))
+                    await ws.send(safe_json({"ok": True, "format": fmt, "compress": msg.get("compress"),
+                                             "stream_ids": hub.stream_ids.ids}))
+
+                elif cmd == "subscribe":
+                    sub = Subscription.from_msg(msg)
+                    hub.clients[ws].sub = sub
+                    hub.clients[ws].grid_cursor = None
+                    await ws.send(safe_json({"ok": True, "subscription": {
+                        "streams": sub.streams, "rate_hz": sub.rate_hz, "mode": sub.mode, "aligned": sub.aligned}}))
+
+                elif cmd == "history":
+                    hub.send_history(ws, daq.buffers, msg)      # reply + frame go out via the client's queue
+
+                # Status
+                elif cmd == "status":
+                    await ws.send(safe_json({"ok": True, "daq": daq.status(), "clients": len(hub.clients),
+                                             "broadcast": hub.stats(), "recorder": recorder.stats(),
+                                             "streams": [c.stats() for c in hub.clients.values()]}))
+
                 # Shutdown
                 elif cmd == "shutdown":
                     await ws.send(safe_json({"ok": True}))
@@ -683,21 +2933,22 @@ async def ws_handler(ws, path, daq: DAQSession, rig: RigSession, hub: Hub, recor
                 else:
                     await ws.send(safe_json({"ok": False, "error": "unknown_command"}))
             except Exception as e:
-                log(f"Command {cmd} error: {e}", "error")
+                log("Command %s error: %s", "error", cmd, e)
                 await ws.send(safe_json({"ok": False, "error": str(e)}))
     finally:
         await hub.unregister(ws)
         log("Client disconnected.", "warn")
 
 # ---------------- Main ----------------
-async def main():
+async def main(backend: str = "nidaqmx"):
     buffers = RingBuffers()
 
     # recorder queues (bounded)
-    daq_queue: asyncio.Queue = asyncio.Queue(maxsize=50_000)      # larger for DAQ high rate
-    rig_queue: asyncio.Queue = asyncio.Queue(maxsize=10_000)
+    daq_queue = RecorderQueue(maxsize=2_000)       # blocks, not samples (~200k samples at default chunk)
+    rig_queue = RecorderQueue(maxsize=10_000)
 
     daq = DAQSession(buffers, daq_queue)
+    daq.configure(backend=backend)
     rig = RigSession(buffers, rig_queue)
     recorder = Recorder(daq_queue, rig_queue)
     hub = Hub()
@@ -706,12 +2957,14 @@ async def main():
     async def handler(ws, path):
         return await ws_handler(ws, path, daq, rig, hub, recorder, shutdown_evt)
 
-    ws_server = await websockets.serve(handler, "localhost", PORT_NUMBER)
+    ws_server = await websockets.serve(handler, "localhost", PORT_NUMBER, compression=WS_COMPRESSION)
     log(f"[ WS ] WebSocket server listening on :{PORT_NUMBER}", "success")
 
     tasks = [
         asyncio.create_task(broadcaster(hub, buffers)),
     ]
+    if ALIGN_RECORD_HZ:
+        tasks.append(asyncio.create_task(aligned_feed(buffers, daq_queue, ALIGN_RECORD_HZ)))
 
     try:
         # stay alive until shutdown command arrives
@@ -732,7 +2985,16 @@ async def main():
         log("Shutdown complete.", "success")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unified DAQ + RIG websocket server")
+    parser.add_argument("--backend", choices=sorted(DAQ_BACKENDS), default="nidaqmx",
+                        help="DAQ backend; 'sim' runs without hardware")
+    parser.add_argument("--log-level", choices=["data", "debug", "info", "warn", "error"], default=LOG_LEVEL,
+                        help="console log level ('debug' echoes commands, 'data' dumps stream frames)")
+    args = parser.parse_args()
+    listener = setup_logging(args.log_level)
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.backend))
     except KeyboardInterrupt:
-        log("KeyboardInterrupt — exiting.", "warn")
\ No newline at end of file
+        log("KeyboardInterrupt — exiting.", "warn")
+    finally:
+        listener.stop()
\ No newline at end of file